@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from typing import List
+from networkx import DiGraph
+
+import numpy as np
+
+
+class CompactGraph(object):
+    """
+        A frozen, integer-indexed copy of the execution graph for the optimizers. Nodes are numbered 0..n-1, node sizes
+        and scores are NumPy arrays indexed by node id, and the parents & children of each node are stored in
+        compressed sparse row (CSR) form: the parents of node i are
+        `parent_indices[parent_offsets[i]:parent_offsets[i + 1]]`, and likewise for children.
+
+        Args:
+            graph (networkx.DiGraph):
+                the graph to copy; nodes are numbered in the order of `graph.nodes`.
+            node_sizes (Dict):
+                the estimated sizes of each node.
+            node_scores (Dict):
+                the estimated time savings of flagging each node.
+    """
+    def __init__(self, graph: DiGraph, node_sizes: dict, node_scores: dict):
+        self.node_names = list(graph.nodes)
+        self.node_ids = {name: i for i, name in enumerate(self.node_names)}
+        self.num_nodes = len(self.node_names)
+
+        self.sizes = np.array([node_sizes[name] for name in self.node_names], dtype=np.float64)
+        self.scores = np.array([node_scores[name] for name in self.node_names], dtype=np.float64)
+
+        self.parent_offsets, self.parent_indices = self.build_csr(graph.predecessors)
+        self.child_offsets, self.child_indices = self.build_csr(graph.successors)
+
+        # The representation is shared by both optimizers, hence it is read-only.
+        for array in (self.sizes, self.scores, self.parent_offsets, self.parent_indices, self.child_offsets,
+                      self.child_indices):
+            array.setflags(write=False)
+
+    """
+        Build the offset & index arrays of the neighbors of each node.
+
+        Args:
+            neighbors (Callable): returns the names of the neighbors of a node.
+    """
+    def build_csr(self, neighbors):
+        offsets = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        indices = []
+        for i, name in enumerate(self.node_names):
+            indices.extend(self.node_ids[neighbor_name] for neighbor_name in neighbors(name))
+            offsets[i + 1] = len(indices)
+        return offsets, np.array(indices, dtype=np.int64)
+
+    """
+        The parents of a node.
+    """
+    def parents(self, node_id: int) -> np.ndarray:
+        return self.parent_indices[self.parent_offsets[node_id]:self.parent_offsets[node_id + 1]]
+
+    """
+        The children of a node.
+    """
+    def children(self, node_id: int) -> np.ndarray:
+        return self.child_indices[self.child_offsets[node_id]:self.child_offsets[node_id + 1]]
+
+    """
+        The concatenated neighbors of several nodes, gathered without a Python loop.
+
+        Returns:
+            sources: the node each neighbor was gathered for.
+            neighbors: the neighbor ids.
+    """
+    @staticmethod
+    def gather(offsets: np.ndarray, indices: np.ndarray, node_ids: np.ndarray):
+        starts = offsets[node_ids]
+        counts = offsets[node_ids + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        # Position of each gathered neighbor within the index array.
+        shifts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return np.repeat(node_ids, counts), indices[shifts + np.arange(total)]
+
+    """
+        The parents of several nodes, as (node, parent) pairs.
+    """
+    def gather_parents(self, node_ids: np.ndarray):
+        return self.gather(self.parent_offsets, self.parent_indices, node_ids)
+
+    """
+        The children of several nodes, as (node, child) pairs.
+    """
+    def gather_children(self, node_ids: np.ndarray):
+        return self.gather(self.child_offsets, self.child_indices, node_ids)
+
+    """
+        Convert node names to an array of node ids.
+    """
+    def to_ids(self, names) -> np.ndarray:
+        return np.array([self.node_ids[name] for name in names], dtype=np.int64)
+
+    """
+        Convert node ids to a list of node names.
+    """
+    def to_names(self, node_ids) -> List[str]:
+        return [self.node_names[i] for i in node_ids]
+
+    """
+        A boolean vector over node ids marking the given nodes.
+    """
+    def to_flags(self, names) -> np.ndarray:
+        flags = np.zeros(self.num_nodes, dtype=bool)
+        flags[self.to_ids(names)] = True
+        return flags
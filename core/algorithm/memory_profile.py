@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from typing import List
+from networkx import DiGraph
+
+
+class MemoryProfile(object):
+    """
+        An incremental memory profile of an execution order, i.e. the bytes resident in memory at each position of the
+        order given a set of flagged nodes. A flagged node is resident over its live interval, from its own position
+        to the position of its last downstream node (to the end of the order if it has none), matching
+        `compute_peak_memory_usage`.
+
+        The profile is kept in a segment tree with range-add and range-max, so flagging or unflagging a node and
+        checking whether flagging a node stays within a memory limit take O(log n) time.
+
+        Args:
+            graph (networkx.DiGraph):
+                the execution graph.
+            execution_order (List):
+                the order to execute nodes of the execution graph in.
+            node_sizes (Dict):
+                the estimated sizes of each node.
+    """
+    def __init__(self, graph: DiGraph, execution_order: List, node_sizes: dict):
+        self.node_sizes = node_sizes
+        self.num_positions = max(len(execution_order), 1)
+
+        # Live interval of each node over positions of the execution order.
+        position = {name: i for i, name in enumerate(execution_order)}
+        self.intervals = {}
+        for name in execution_order:
+            successor_positions = [position[child_name] for child_name in graph.successors(name)]
+            end = max(successor_positions) if successor_positions else len(execution_order) - 1
+            self.intervals[name] = (position[name], end)
+
+        # A bottom-up segment tree over the positions, padded to a power of two: the maximum over the range of each
+        # tree node, and the pending addition to the whole range of each internal tree node.
+        self.num_leaves = 1
+        while self.num_leaves < self.num_positions:
+            self.num_leaves *= 2
+        self.tree_max = [0] * (2 * self.num_leaves)
+        self.tree_add = [0] * self.num_leaves
+
+        self.flagged_node_names = set()
+
+    def apply(self, index: int, value):
+        self.tree_max[index] += value
+        if index < self.num_leaves:
+            self.tree_add[index] += value
+
+    """
+        Recompute the maxima of the ancestors of a tree node.
+    """
+    def build(self, index: int):
+        while index > 1:
+            index >>= 1
+            self.tree_max[index] = max(self.tree_max[2 * index], self.tree_max[2 * index + 1]) + self.tree_add[index]
+
+    """
+        Push the pending additions of the ancestors of a tree node down to it.
+    """
+    def push(self, index: int):
+        for shift in range(self.num_leaves.bit_length() - 1, 0, -1):
+            ancestor = index >> shift
+            if self.tree_add[ancestor] != 0:
+                self.apply(2 * ancestor, self.tree_add[ancestor])
+                self.apply(2 * ancestor + 1, self.tree_add[ancestor])
+                self.tree_add[ancestor] = 0
+
+    """
+        Add a value to the positions left..right (inclusive).
+    """
+    def range_add(self, left: int, right: int, value):
+        left += self.num_leaves
+        right += self.num_leaves + 1
+        first, last = left, right - 1
+        while left < right:
+            if left & 1:
+                self.apply(left, value)
+                left += 1
+            if right & 1:
+                right -= 1
+                self.apply(right, value)
+            left >>= 1
+            right >>= 1
+        self.build(first)
+        self.build(last)
+
+    """
+        The maximum over the positions left..right (inclusive).
+    """
+    def range_max(self, left: int, right: int):
+        left += self.num_leaves
+        right += self.num_leaves + 1
+        self.push(left)
+        self.push(right - 1)
+        result = float('-inf')
+        while left < right:
+            if left & 1:
+                result = max(result, self.tree_max[left])
+                left += 1
+            if right & 1:
+                right -= 1
+                result = max(result, self.tree_max[right])
+            left >>= 1
+            right >>= 1
+        return result
+
+    """
+        Flag a node, adding its size over its live interval.
+    """
+    def add(self, name):
+        if name not in self.flagged_node_names:
+            self.flagged_node_names.add(name)
+            self.range_add(*self.intervals[name], self.node_sizes[name])
+
+    """
+        Unflag a node, removing its size from its live interval.
+    """
+    def remove(self, name):
+        if name in self.flagged_node_names:
+            self.flagged_node_names.remove(name)
+            self.range_add(*self.intervals[name], -self.node_sizes[name])
+
+    """
+        The peak memory usage of the flagged nodes.
+    """
+    def get_peak(self):
+        return self.tree_max[1]
+
+    """
+        The peak memory usage if a node were additionally flagged.
+    """
+    def peak_with(self, name):
+        if name in self.flagged_node_names:
+            return self.get_peak()
+        return max(self.get_peak(), self.range_max(*self.intervals[name]) + self.node_sizes[name])
+
+    """
+        Check whether a node can be additionally flagged without exceeding a memory limit.
+    """
+    def fits(self, name, memory_limit) -> bool:
+        return self.peak_with(name) <= memory_limit
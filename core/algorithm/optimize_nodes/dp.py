@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from core.algorithm.optimize_nodes.nodes_optimizer import NodesOptimizer
+from core.algorithm.optimize_nodes.lagrangian import FlagNodesLagrangian
+
+import math
+import numpy as np
+
+
+class FlagNodesDP(NodesOptimizer):
+    """
+        Flag nodes optimally by dynamic programming on tree-shaped workloads, i.e. graphs where the result of each node
+        is read by at most one other node (an in-forest), executed in an order running the subtree of each node
+        contiguously. The live interval of an input then only overlaps the subtrees of the later inputs of the same
+        node, so the memory held outside a subtree while it runs is a single number, and the best flags of each subtree
+        under each memory budget combine like a knapsack over the inputs of its node. Sizes are rounded up to
+        `memory_limit / num_buckets`, so solutions are optimal up to that granularity and always within the limit.
+
+        Only in-forests in such orders are supported. Graphs where a result is read by several nodes, including
+        series-parallel graphs whose shared inputs have crossing live intervals, are always handed to the fallback
+        flagger, as are orders interleaving subtrees. The initial topological order and the MA-DFS & SA orders
+        generally interleave subtrees, hence the DP should be paired with `OptimizeOrderPostOrder`, which emits
+        post-orders of in-forests; the first iteration of the `Optimizer`, on the initial order, still uses the
+        fallback.
+
+        Args:
+            debug (bool):
+                whether to print debug messages during optimization.
+            num_buckets (int):
+                the number of units the memory limit is discretized into.
+            fallback (NodesOptimizer):
+                the flagger used on graphs & orders not supported by the DP; `FlagNodesLagrangian` by default.
+    """
+    def __init__(self, debug=False, num_buckets=128, fallback=None):
+        super().__init__(debug)
+        self.num_buckets = num_buckets
+        self.fallback = fallback if fallback is not None else FlagNodesLagrangian(debug)
+
+        # Whether the last call was solved by the DP rather than the fallback.
+        self.solved_by_dp = None
+
+    def set_graph(self, graph, memory_limit, node_scores, node_sizes, nodes_to_exclude, compact_graph=None):
+        super().set_graph(graph, memory_limit, node_scores, node_sizes, nodes_to_exclude, compact_graph)
+        self.fallback.set_graph(graph, memory_limit, node_scores, node_sizes, nodes_to_exclude, self.compact_graph)
+
+    def set_execution_order(self, execution_order):
+        super().set_execution_order(execution_order)
+        self.fallback.set_execution_order(execution_order)
+
+    """
+        Check whether the graph is an in-forest whose subtrees are each executed contiguously, ending with their root.
+    """
+    def is_supported(self) -> bool:
+        if any(self.graph.out_degree(name) > 1 for name in self.execution_order):
+            return False
+
+        # The first position & the number of nodes of the subtree of each node.
+        position = {name: i for i, name in enumerate(self.execution_order)}
+        first_position = {}
+        subtree_size = {}
+        for name in self.execution_order:
+            parent_names = list(self.graph.predecessors(name))
+            first_position[name] = min([first_position[parent_name] for parent_name in parent_names],
+                                       default=position[name])
+            subtree_size[name] = 1 + sum(subtree_size[parent_name] for parent_name in parent_names)
+            if position[name] - first_position[name] + 1 != subtree_size[name]:
+                return False
+
+        return True
+
+    """
+        Run the knapsack over the inputs of a node.
+
+        Args:
+            budgets (np.ndarray): the memory budgets (in units) available to the subtree of the node.
+            input_tables (List): the (weight, value if not flagged, value if flagged) of each input, in execution order.
+            history (List): if given, the table after each input is appended to it for backtracking.
+
+        Returns:
+            table: the best score of the subtrees of the inputs for each budget & remaining budget after the flagged
+                inputs, or -inf if infeasible.
+    """
+    def run_inputs(self, budgets, input_tables, history=None):
+        table = np.full((len(budgets), self.num_buckets + 1), -np.inf)
+        table[np.arange(len(budgets)), budgets] = 0
+
+        for weight, unflagged_values, flagged_values in input_tables:
+            # The subtree of an input runs within the remaining budget, which shrinks by its weight if it is flagged.
+            new_table = table + unflagged_values
+            if weight <= self.num_buckets:
+                np.maximum(new_table[:, :self.num_buckets + 1 - weight], table[:, weight:] + flagged_values[weight:],
+                           out=new_table[:, :self.num_buckets + 1 - weight])
+            table = new_table
+
+            if history is not None:
+                history.append(table)
+
+        return table
+
+    def flag_nodes(self) -> set:
+        self.solved_by_dp = self.memory_limit > 0 and self.is_supported()
+        if not self.solved_by_dp:
+            if self.debug:
+                print("Graph or order not supported by the DP, using the fallback")
+            return self.fallback.flag_nodes()
+
+        unit = self.memory_limit / self.num_buckets
+        weights = {}
+        for name in self.execution_order:
+            weights[name] = self.num_buckets + 1 if name in self.nodes_to_exclude else \
+                int(math.ceil(self.node_sizes[name] / unit))
+
+        position = {name: i for i, name in enumerate(self.execution_order)}
+        input_names = {name: sorted(self.graph.predecessors(name), key=lambda item: position[item])
+                       for name in self.execution_order}
+
+        # The best score of the subtree of each node for each budget, if the node is not flagged & if it is.
+        values = {}
+        all_budgets = np.arange(self.num_buckets + 1)
+        for name in self.execution_order:
+            flagged_values = np.full(self.num_buckets + 1, -np.inf)
+
+            # Nodes without inputs only need the budget to hold themselves.
+            if len(input_names[name]) == 0:
+                flagged_values[weights[name]:] = self.node_scores[name]
+                values[name] = (np.zeros(self.num_buckets + 1), flagged_values)
+                continue
+
+            table = self.run_inputs(all_budgets, [(weights[input_name],) + values[input_name]
+                                                  for input_name in input_names[name]])
+
+            # The inputs are still resident when the node is created.
+            unflagged_values = table.max(axis=1)
+            if weights[name] <= self.num_buckets:
+                flagged_values[weights[name]:] = table[weights[name]:, weights[name]:].max(axis=1) + \
+                    self.node_scores[name]
+            values[name] = (unflagged_values, flagged_values)
+
+        # Outputs are never freed, hence they are the inputs of a virtual node after the end of the order.
+        output_names = [name for name in self.execution_order if self.graph.out_degree(name) == 0]
+        assignments = [(output_names, self.num_buckets, 0)]
+
+        # Backtrack the budget & flag of each node, from the outputs up.
+        nodes_to_flag_names = set()
+        while len(assignments) > 0:
+            names, budget, weight = assignments.pop()
+            history = []
+            input_tables = [(weights[input_name],) + values[input_name] for input_name in names]
+            table = self.run_inputs(np.array([budget]), input_tables, history)[0]
+            remaining = weight + int(np.argmax(table[weight:]))
+
+            for i in range(len(names) - 1, -1, -1):
+                previous_table = history[i - 1][0] if i > 0 else \
+                    np.where(all_budgets == budget, 0, -np.inf)
+                input_weight, unflagged_values, flagged_values = input_tables[i]
+
+                if previous_table[remaining] + unflagged_values[remaining] == history[i][0][remaining]:
+                    flagged = False
+                else:
+                    remaining += input_weight
+                    flagged = True
+                    nodes_to_flag_names.add(names[i])
+
+                assignments.append((input_names[names[i]], remaining, input_weight if flagged else 0))
+
+        if self.debug:
+            print("Time save:", sum(self.node_scores[name] for name in nodes_to_flag_names))
+
+        return nodes_to_flag_names
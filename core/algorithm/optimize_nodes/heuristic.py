@@ -3,7 +3,7 @@
 #
 # Copyright 2021-2022 University of Illinois
 from core.algorithm.optimize_nodes.nodes_optimizer import NodesOptimizer
-from core.utils import compute_peak_memory_usage
+from core.algorithm.memory_profile import MemoryProfile
 
 
 class FlagNodesHeuristic(NodesOptimizer):
@@ -19,6 +19,7 @@ class FlagNodesHeuristic(NodesOptimizer):
 
     def flag_nodes(self) -> set:
         nodes_to_flag_names = set()
+        memory_profile = MemoryProfile(self.graph, self.execution_order, self.node_sizes)
 
         # Compute ratio for each node
         heuristic_dict = {}
@@ -28,17 +29,14 @@ class FlagNodesHeuristic(NodesOptimizer):
             except:
                 heuristic_dict[name] = self.node_scores[name]
 
-        # iterate through nodes in random order
-        for name in [k for k, v in sorted(heuristic_dict.items(), key=lambda item:item[1])]:
+        # iterate through nodes in descending order of ratio
+        for name in [k for k, v in sorted(heuristic_dict.items(), key=lambda item: -item[1])]:
             if name in self.nodes_to_exclude:
                 continue
 
-            peak_memory_usage = compute_peak_memory_usage(self.graph, self.execution_order, self.node_sizes,
-                                                          nodes_to_flag_names.union({name}))
-
             # flag node if current memory usage allows
-            if (peak_memory_usage <= self.memory_limit and
-                    name not in self.nodes_to_exclude):
+            if memory_profile.fits(name, self.memory_limit):
+                memory_profile.add(name)
                 nodes_to_flag_names.add(name)
 
         return nodes_to_flag_names
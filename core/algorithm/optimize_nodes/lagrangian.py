@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from core.algorithm.optimize_nodes.nodes_optimizer import NodesOptimizer
+
+import numpy as np
+
+
+class FlagNodesLagrangian(NodesOptimizer):
+    """
+        Flag nodes by Lagrangian relaxation of the multidimensional knapsack problem (MKP) solved by `FlagNodesMkp`.
+        The memory limit constraint of each maximal set is moved into the objective with a multiplier, leaving a
+        problem solved by flagging every node whose score exceeds its multiplier-weighted size. The multipliers are
+        tuned with subgradient steps; each relaxed solution is repaired into a feasible one by unflagging nodes from
+        violated sets and greedily flagging nodes which still fit. The relaxation gives an upper bound on the time
+        save, hence the optimality gap of the returned solution.
+
+        Args:
+            debug (bool):
+                whether to print debug messages during optimization.
+            max_iters (int):
+                the maximum number of subgradient iterations.
+            step_scale (float):
+                the initial scale of the Polyak step size.
+            patience (int):
+                the number of iterations without improving the upper bound before halving the step scale.
+            gap_tolerance (float):
+                stop once the relative gap between the upper bound and the best solution falls below this value.
+    """
+    def __init__(self, debug=False, max_iters=200, step_scale=2.0, patience=10, gap_tolerance=0.001):
+        super().__init__(debug)
+        self.max_iters = max_iters
+        self.step_scale = step_scale
+        self.patience = patience
+        self.gap_tolerance = gap_tolerance
+
+        # Time save of the last returned solution, the upper bound on it, and their relative gap.
+        self.lower_bound = None
+        self.upper_bound = None
+        self.gap = None
+
+    """
+        Repair a relaxed solution into one satisfying all maximal set constraints, then flag further nodes which fit.
+
+        Args:
+            flags (np.ndarray): whether each vector node is flagged in the relaxed solution.
+            reduced_profits (np.ndarray): the score of each vector node less its multiplier-weighted size.
+            loads (np.ndarray): the combined size of the flagged nodes of each maximal set.
+            sizes (np.ndarray): the size of each vector node.
+            add_order (np.ndarray): the vector nodes in the order to try flagging them.
+            set_indices (np.ndarray): the maximal set of each (set, node) membership.
+            node_indices (np.ndarray): the vector node of each (set, node) membership.
+            node_sets (List): the indices of the maximal sets containing each vector node.
+    """
+    def repair(self, flags, reduced_profits, loads, sizes, add_order, set_indices, node_indices, node_sets):
+        flags = flags.copy()
+        num_nodes = len(flags)
+
+        # Unflag the least profitable nodes of violated sets. A set still violated after its members were visited
+        # had all of them unflagged, so all sets are satisfied afterwards. Loads only decrease, so only nodes of
+        # initially violated sets are visited.
+        violated = np.bincount(node_indices, loads[set_indices] > self.memory_limit, num_nodes) > 0
+        to_visit = np.flatnonzero(flags & violated)
+
+        # Memberships are short, so plain Python lists are faster to check than NumPy arrays.
+        loads = loads.tolist()
+        size_list = sizes.tolist()
+        for i in to_visit[np.argsort(reduced_profits[to_visit])].tolist():
+            if any(loads[j] > self.memory_limit for j in node_sets[i]):
+                flags[i] = False
+                for j in node_sets[i]:
+                    loads[j] -= size_list[i]
+
+        # Flag nodes which still fit in all their sets. Loads only increase, so nodes which do not fit now are
+        # skipped.
+        loads = np.array(loads)
+        max_loads = np.zeros(num_nodes)
+        np.maximum.at(max_loads, node_indices, loads[set_indices])
+        fits = ~flags & (max_loads + sizes <= self.memory_limit)
+
+        loads = loads.tolist()
+        for i in add_order[fits[add_order]].tolist():
+            if all(loads[j] + size_list[i] <= self.memory_limit for j in node_sets[i]):
+                flags[i] = True
+                for j in node_sets[i]:
+                    loads[j] += size_list[i]
+
+        return flags
+
+    def flag_nodes(self) -> set:
+        # Find maximal sets.
+        maximal_sets = self.find_maximal_sets()
+
+        # Nodes not in any maximal set can always be stored; store all nodes which are not trivially excluded.
+        nodes_to_flag_names = {name for name in self.execution_order if name not in self.nodes_to_exclude}
+
+        vector_nodes = sorted(frozenset().union(*maximal_sets))
+        free_time_save = sum(self.node_scores[name] for name in nodes_to_flag_names.difference(vector_nodes))
+
+        # Trivial computation where there are no maximal sets
+        if len(maximal_sets) == 0:
+            self.lower_bound = self.upper_bound = free_time_save
+            self.gap = 0
+            return nodes_to_flag_names
+
+        # Sparse incidence of maximal sets & vector nodes, as (set, node) pairs.
+        node_index = {name: i for i, name in enumerate(vector_nodes)}
+        set_indices = np.array([j for j, maximal_set in enumerate(maximal_sets) for _ in maximal_set], dtype=np.int64)
+        node_indices = np.array([node_index[name] for maximal_set in maximal_sets for name in maximal_set],
+                                dtype=np.int64)
+        node_sets = [[] for _ in vector_nodes]
+        for j, i in zip(set_indices.tolist(), node_indices.tolist()):
+            node_sets[i].append(j)
+
+        scores = np.array([self.node_scores[name] for name in vector_nodes], dtype=np.float64)
+        sizes = np.array([self.node_sizes[name] for name in vector_nodes], dtype=np.float64)
+        num_sets = len(maximal_sets)
+
+        # Nodes are greedily flagged in the order of ratio of score to size during repairs.
+        add_order = np.argsort(-scores / np.maximum(sizes, 1))
+
+        # Relaxed solutions often repeat across iterations, and are only repaired once.
+        repaired_solutions = set()
+
+        multipliers = np.zeros(num_sets)
+        best_flags = np.zeros(len(vector_nodes), dtype=bool)
+        best_lower_bound = 0
+        best_upper_bound = float('inf')
+        step_scale = self.step_scale
+        iters_since_improvement = 0
+
+        for iteration in range(self.max_iters):
+            # Solve the relaxation: flag nodes whose score exceeds the multiplier-weighted size.
+            reduced_profits = scores - sizes * np.bincount(node_indices, multipliers[set_indices], len(vector_nodes))
+            flags = reduced_profits > 0
+            upper_bound = reduced_profits[flags].sum() + self.memory_limit * multipliers.sum()
+
+            if upper_bound < best_upper_bound * (1 - 1e-9):
+                best_upper_bound = upper_bound
+                iters_since_improvement = 0
+            else:
+                iters_since_improvement += 1
+                if iters_since_improvement >= self.patience:
+                    step_scale /= 2
+                    iters_since_improvement = 0
+
+            # Repair the relaxed solution into a feasible one.
+            loads = np.bincount(set_indices, (sizes * flags)[node_indices], num_sets)
+            if flags.tobytes() not in repaired_solutions:
+                repaired_solutions.add(flags.tobytes())
+                repaired_flags = self.repair(flags, reduced_profits, loads, sizes, add_order, set_indices, node_indices,
+                                             node_sets)
+                lower_bound = scores[repaired_flags].sum()
+                if lower_bound > best_lower_bound:
+                    best_lower_bound = lower_bound
+                    best_flags = repaired_flags
+
+            if self.debug:
+                print("Iteration", iteration, "lower bound:", best_lower_bound, "upper bound:", upper_bound)
+
+            if best_upper_bound - best_lower_bound <= self.gap_tolerance * best_upper_bound or step_scale < 1e-6:
+                break
+
+            # Subgradient step on the multipliers of the violated (or slack) sets.
+            subgradients = loads - self.memory_limit
+            norm = np.dot(subgradients, subgradients)
+            if norm == 0:
+                break
+            step = step_scale * (upper_bound - best_lower_bound) / norm
+            multipliers = np.maximum(multipliers + step * subgradients, 0)
+
+        nodes_to_flag_names.difference_update(vector_nodes[i] for i in np.flatnonzero(~best_flags))
+
+        self.lower_bound = free_time_save + best_lower_bound
+        self.upper_bound = free_time_save + min(best_upper_bound, scores.sum())
+        self.gap = (self.upper_bound - self.lower_bound) / self.upper_bound if self.upper_bound > 0 else 0
+
+        if self.debug:
+            print("Time save:", self.lower_bound, "upper bound:", self.upper_bound, "gap:", self.gap)
+
+        return nodes_to_flag_names
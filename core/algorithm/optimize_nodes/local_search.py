@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from core.algorithm.optimize_nodes.nodes_optimizer import NodesOptimizer
+from core.algorithm.optimize_nodes.heuristic import FlagNodesHeuristic
+from core.algorithm.memory_profile import MemoryProfile
+
+import time
+
+
+class FlagNodesLocalSearch(NodesOptimizer):
+    """
+        Improves the nodes flagged by another nodes optimizer by local search. Moves are tried until none improves the
+        time save or the time budget runs out:
+            - add: flag a node which fits.
+            - swap: unflag a node and flag one or two nodes with a higher combined score in its place.
+        Nodes are only dropped as part of a swap, since dropping a node alone never increases the time save.
+        Feasibility of each move is checked incrementally on a `MemoryProfile`.
+
+        Args:
+            debug (bool):
+                whether to print debug messages during optimization.
+            base (NodesOptimizer):
+                the nodes optimizer whose solution is improved; `FlagNodesHeuristic` by default.
+            time_limit (float):
+                the time budget of the local search in seconds.
+            max_pair_candidates (int):
+                the number of highest scoring nodes considered for each node of a two-node swap.
+    """
+    def __init__(self, debug=False, base=None, time_limit=1.0, max_pair_candidates=20):
+        super().__init__(debug)
+        self.base = base if base is not None else FlagNodesHeuristic(debug)
+        self.time_limit = time_limit
+        self.max_pair_candidates = max_pair_candidates
+
+        # Time saves of the solution of the base optimizer & after the local search.
+        self.base_time_save = None
+        self.time_save = None
+
+    def set_graph(self, graph, memory_limit, node_scores, node_sizes, nodes_to_exclude, compact_graph=None):
+        super().set_graph(graph, memory_limit, node_scores, node_sizes, nodes_to_exclude, compact_graph)
+        self.base.set_graph(graph, memory_limit, node_scores, node_sizes, nodes_to_exclude, self.compact_graph)
+
+    def set_execution_order(self, execution_order):
+        super().set_execution_order(execution_order)
+        self.base.set_execution_order(execution_order)
+
+    """
+        Flag the highest scoring nodes which fit.
+
+        Returns:
+            improved: whether any node was flagged.
+    """
+    def try_add(self, memory_profile, unflagged_names) -> bool:
+        improved = False
+        for name in sorted(unflagged_names, key=lambda item: -self.node_scores[item]):
+            if memory_profile.fits(name, self.memory_limit):
+                memory_profile.add(name)
+                unflagged_names.remove(name)
+                improved = True
+
+        return improved
+
+    """
+        Unflag a node and flag one or two nodes with a higher combined score in its place.
+
+        Returns:
+            improved: whether a swap was made.
+    """
+    def try_swap(self, memory_profile, unflagged_names, name) -> bool:
+        start, end = memory_profile.intervals[name]
+
+        # Only nodes resident at the same time as the unflagged node may fit in its place.
+        candidates = [candidate for candidate in unflagged_names
+                      if memory_profile.intervals[candidate][0] <= end and
+                      memory_profile.intervals[candidate][1] >= start]
+        candidates.sort(key=lambda item: -self.node_scores[item])
+
+        memory_profile.remove(name)
+
+        # One node in place of one
+        num_higher_scoring = 0
+        for candidate in candidates:
+            if self.node_scores[candidate] <= self.node_scores[name]:
+                break
+            num_higher_scoring += 1
+            if memory_profile.fits(candidate, self.memory_limit):
+                memory_profile.add(candidate)
+                unflagged_names.remove(candidate)
+                unflagged_names.add(name)
+                return True
+
+        # Two nodes in place of one. Both must fit on their own, which the higher scoring nodes do not.
+        pair_candidates = [candidate for candidate in
+                           candidates[num_higher_scoring:num_higher_scoring + self.max_pair_candidates]
+                           if memory_profile.fits(candidate, self.memory_limit)]
+        for i, first in enumerate(pair_candidates):
+            memory_profile.add(first)
+            for second in pair_candidates[i + 1:]:
+                if self.node_scores[first] + self.node_scores[second] <= self.node_scores[name]:
+                    break
+                if memory_profile.fits(second, self.memory_limit):
+                    memory_profile.add(second)
+                    unflagged_names.difference_update((first, second))
+                    unflagged_names.add(name)
+                    return True
+            memory_profile.remove(first)
+
+        memory_profile.add(name)
+        return False
+
+    def flag_nodes(self) -> set:
+        start_time = time.time()
+        nodes_to_flag_names = self.base.flag_nodes()
+
+        memory_profile = MemoryProfile(self.graph, self.execution_order, self.node_sizes)
+        for name in nodes_to_flag_names:
+            memory_profile.add(name)
+        unflagged_names = {name for name in self.execution_order
+                           if name not in self.nodes_to_exclude and name not in nodes_to_flag_names}
+
+        self.base_time_save = sum(self.node_scores[name] for name in nodes_to_flag_names)
+
+        # Repeat passes of moves until a pass makes no improvement or the time runs out.
+        improved = True
+        while improved and time.time() - start_time < self.time_limit:
+            improved = self.try_add(memory_profile, unflagged_names)
+
+            # Try replacing the lowest scoring flagged nodes first.
+            for name in sorted(memory_profile.flagged_node_names, key=lambda item: self.node_scores[item]):
+                if time.time() - start_time >= self.time_limit:
+                    break
+                if self.try_swap(memory_profile, unflagged_names, name):
+                    improved = True
+
+        nodes_to_flag_names = set(memory_profile.flagged_node_names)
+        self.time_save = sum(self.node_scores[name] for name in nodes_to_flag_names)
+
+        if self.debug:
+            print("Time save:", self.base_time_save, "->", self.time_save)
+
+        return nodes_to_flag_names
@@ -5,117 +5,103 @@
 
 from core.algorithm.optimize_nodes.nodes_optimizer import NodesOptimizer
 
-from typing import List
-from ortools.algorithms import pywrapknapsack_solver
-import copy
+from ortools.sat.python import cp_model
+import math
 
 
 class FlagNodesMkp(NodesOptimizer):
     """
         Flag nodes by converting the optimization problem to a multidimensional knapsack problem (MKP) and solving it using
-        branch & bound.
+        the CP-SAT solver. Each maximal set is a sparse constraint over its own members only, and the solver is
+        warm-started from the nodes flagged in the previous call, e.g. the previous EM iteration of the `Optimizer`.
+        If the time limit is hit, the best solution found so far is used.
 
         Args:
             debug (bool):
                 whether to print debug messages during optimization.
+            time_limit (float):
+                the time limit of the solver in seconds.
+            size_unit (int):
+                the granularity sizes are rounded up to in the constraints; coarser units speed up solving at the cost
+                of leaving some memory unused.
+            profit_resolution (int):
+                the integer profit of the node with the highest score; lower scores are scaled proportionally.
+            num_workers (int):
+                the number of search workers of the solver, or 0 for the solver's default.
     """
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, time_limit=10, size_unit=1, profit_resolution=1000000, num_workers=0):
         super().__init__(debug)
-
-    """
-        Find all relevant maximal sets of results which act as constraints
-        for the MKP.
-    """
-    def find_maximal_sets(self) -> List[set]:
-        # Keep track of when to simulate garbage collection of results
-        num_successors = [len(list(self.graph.successors(i))) for i in self.execution_order]
-        num_successors_dict = dict(zip(self.execution_order, num_successors))
-
-        maximal_sets = []
-        current_set = set()
-        current_memory_usage = 0
-
-        for name in self.execution_order:
-            if name not in self.nodes_to_exclude:
-                current_set.add(name)
-                current_memory_usage += self.node_sizes[name]
-
-            # Find dependencies to garbage collect
-            dependencies_to_free = set()
-            for parent_name in self.graph.predecessors(name):
-                num_successors_dict[parent_name] -= 1
-                if num_successors_dict[parent_name] == 0 and parent_name not in self.nodes_to_exclude:
-                    dependencies_to_free.add(parent_name)
-
-            # If there are dependencies to remove, current set must be maximal.
-            # Add the set if it is a nontrivial constraint (i.e. the combined
-            # size exceeds the memory limit)
-            if len(dependencies_to_free) > 0 and current_memory_usage > self.memory_limit:
-                maximal_sets.append(copy.deepcopy(current_set))
-
-            # Simulate garbage collection of dependencies
-            for parent_name in dependencies_to_free:
-                current_memory_usage -= self.node_sizes[parent_name]
-            current_set = current_set.difference(dependencies_to_free)
-
-        # Edge case for adding last set
-        if (current_memory_usage > self.memory_limit and (
-                not current_set.issubset(maximal_sets[-1]) or len(maximal_sets) == 0)):
-            maximal_sets.append(copy.deepcopy(current_set))
-
-        if self.debug:
-            print("number of maximal sets:", len(maximal_sets))
-
-        return maximal_sets
+        self.time_limit = time_limit
+        self.size_unit = size_unit
+        self.profit_resolution = profit_resolution
+        self.num_workers = num_workers
+
+        # Result of the last solve: the flagged nodes, the solver status, and the time save of the constrained nodes
+        # found & its upper bound.
+        self.best_solution = None
+        self.status = None
+        self.objective_value = None
+        self.upper_bound = None
 
     def flag_nodes(self) -> set:
         # Find maximal sets.
         maximal_sets = self.find_maximal_sets()
 
-        nodes_to_flag_names = set()
+        # Nodes not in any maximal set can always be stored; store all nodes which are not trivially excluded.
+        nodes_to_flag_names = {name for name in self.execution_order if name not in self.nodes_to_exclude}
 
-        # Trivial computation where there are no maximal sets; store all nodes
-        # which are not trivially excluded.
+        # Trivial computation where there are no maximal sets
         if len(maximal_sets) == 0:
-            for name in self.execution_order:
-                if name not in self.nodes_to_exclude:
-                    nodes_to_flag_names.add(name)
-
+            self.best_solution = nodes_to_flag_names
+            self.status = "TRIVIAL"
             return nodes_to_flag_names
 
         # The vector consists of nodes which appear in at least 1 maximal set.
-        vector_nodes = set()
-        for maximal_set in maximal_sets:
-            vector_nodes = vector_nodes.union(maximal_set)
-        vector_nodes = list(vector_nodes)
+        vector_nodes = sorted(frozenset().union(*maximal_sets))
 
-        # Scale scores to transform problem into integer programming
-        multiplier = 1 / min([self.node_scores[name] for name in vector_nodes])
+        # Scale scores & sizes to transform problem into integer programming. Sizes are rounded up so solutions stay
+        # within the memory limit.
+        score_scale = self.profit_resolution / max(self.node_scores[name] for name in vector_nodes)
+        profits = {name: max(int(round(self.node_scores[name] * score_scale)), 1) for name in vector_nodes}
+        weights = {name: int(math.ceil(self.node_sizes[name] / self.size_unit)) for name in vector_nodes}
+        capacity = int(math.floor(self.memory_limit / self.size_unit))
 
-        profits = [self.node_scores[name] * multiplier for name in vector_nodes]
-        weights = []
+        model = cp_model.CpModel()
+        variables = {name: model.NewBoolVar(name) for name in vector_nodes}
         for maximal_set in maximal_sets:
-            weights.append([int(name in maximal_set) * self.node_sizes[name]
-                            for name in vector_nodes])
-        capacities = [self.memory_limit for i in range(len(maximal_sets))]
-
-        # Initialize Google MKP solver
-        solver = pywrapknapsack_solver.KnapsackSolver(
-            pywrapknapsack_solver.KnapsackSolver.KNAPSACK_MULTIDIMENSION_SCIP_MIP_SOLVER,
-            'Multi-dimensional solver')
-        solver.Init(profits, weights, capacities)
-        solver.set_time_limit(10)
-        solver.Solve()
-
-        # Gather nodes to store in memory
-        for i in range(len(vector_nodes)):
-            if solver.BestSolutionContains(i):
-                nodes_to_flag_names.add(vector_nodes[i])
-
-        # Add nodes not in any valid maximal set due to all member maximal sets
-        # which it is a part of being under the size limit.
-        for name in self.graph.nodes:
-            if name not in vector_nodes and name not in self.nodes_to_exclude:
-                nodes_to_flag_names.add(name)
+            model.Add(sum(weights[name] * variables[name] for name in maximal_set) <= capacity)
+        model.Maximize(sum(profits[name] * variables[name] for name in vector_nodes))
+
+        # Warm start from the previous solution
+        if self.best_solution is not None:
+            for name in vector_nodes:
+                model.AddHint(variables[name], int(name in self.best_solution))
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = self.time_limit
+        if self.num_workers > 0:
+            solver.parameters.num_search_workers = self.num_workers
+        status = solver.Solve(model)
+        self.status = solver.StatusName(status)
+
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            # Gather nodes to store in memory
+            nodes_to_flag_names.difference_update(name for name in vector_nodes if not solver.Value(variables[name]))
+            self.objective_value = solver.ObjectiveValue() / score_scale
+            self.upper_bound = solver.BestObjectiveBound() / score_scale
+        else:
+            # No solution within the time limit; keep the previous solution if it is still feasible, otherwise store
+            # none of the constrained nodes.
+            previous_solution = self.best_solution if self.best_solution is not None else set()
+            if any(sum(weights[name] for name in maximal_set if name in previous_solution) > capacity
+                   for maximal_set in maximal_sets):
+                previous_solution = set()
+            nodes_to_flag_names.difference_update(name for name in vector_nodes if name not in previous_solution)
+            self.objective_value = None
+            self.upper_bound = None
+
+        if self.debug:
+            print("MKP status:", self.status, "objective:", self.objective_value, "upper bound:", self.upper_bound)
 
+        self.best_solution = nodes_to_flag_names
         return nodes_to_flag_names
@@ -5,6 +5,7 @@
 from typing import List
 from networkx import DiGraph
 
+from core.algorithm.compact_graph import CompactGraph
 import networkx
 
 
@@ -23,6 +24,7 @@ class NodesOptimizer(object):
         self.node_scores = None
         self.node_sizes = None
         self.nodes_to_exclude = None
+        self.compact_graph = None
         self.debug = debug
 
     """
@@ -41,13 +43,18 @@ class NodesOptimizer(object):
                 the estimated sizes of each node
             nodes_to_exclude (List):
                 a list of nodes to trivially not flag.
+            compact_graph (CompactGraph):
+                the integer-indexed copy of the graph; built from the graph if not given.
         """
-    def set_graph(self, graph: DiGraph, memory_limit: int, node_scores: dict, node_sizes: dict, nodes_to_exclude: List):
+    def set_graph(self, graph: DiGraph, memory_limit: int, node_scores: dict, node_sizes: dict, nodes_to_exclude: List,
+                  compact_graph: CompactGraph = None):
         self.graph = graph
         self.memory_limit = memory_limit
         self.node_scores = node_scores
         self.node_sizes = node_sizes
         self.nodes_to_exclude = nodes_to_exclude
+        self.compact_graph = compact_graph if compact_graph is not None else \
+            CompactGraph(graph, node_sizes, node_scores)
 
     """
         Sets the execution order for the current iteration.
@@ -55,6 +62,79 @@ class NodesOptimizer(object):
     def set_execution_order(self, execution_order: List):
         self.execution_order = execution_order
 
+    """
+        Find all relevant maximal sets of results which act as constraints for flagging nodes, i.e. the non-excluded
+        nodes resident together just before some result is garbage collected, whose combined size exceeds the memory
+        limit. Sets contained in another set are dominated and pruned, as are duplicates.
+    """
+    def find_maximal_sets(self) -> List[frozenset]:
+        # Keep track of when to simulate garbage collection of results
+        num_successors_dict = {name: self.graph.out_degree(name) for name in self.execution_order}
+
+        maximal_sets = []
+        current_set = set()
+        current_memory_usage = 0
+
+        for name in self.execution_order:
+            if name not in self.nodes_to_exclude:
+                current_set.add(name)
+                current_memory_usage += self.node_sizes[name]
+
+            # Find dependencies to garbage collect
+            dependencies_to_free = []
+            for parent_name in self.graph.predecessors(name):
+                num_successors_dict[parent_name] -= 1
+                if num_successors_dict[parent_name] == 0 and parent_name in current_set:
+                    dependencies_to_free.append(parent_name)
+
+            # If there are dependencies to remove, current set must be maximal.
+            # Add the set if it is a nontrivial constraint (i.e. the combined
+            # size exceeds the memory limit)
+            if len(dependencies_to_free) > 0 and current_memory_usage > self.memory_limit:
+                maximal_sets.append(frozenset(current_set))
+
+            # Simulate garbage collection of dependencies
+            for parent_name in dependencies_to_free:
+                current_memory_usage -= self.node_sizes[parent_name]
+                current_set.remove(parent_name)
+
+        # Edge case for adding last set
+        if current_memory_usage > self.memory_limit:
+            maximal_sets.append(frozenset(current_set))
+
+        maximal_sets = self.prune_dominated_sets(maximal_sets)
+
+        if self.debug:
+            print("number of maximal sets:", len(maximal_sets))
+
+        return maximal_sets
+
+    """
+        Remove duplicate sets and sets contained in another set, whose constraints are implied by the larger set.
+    """
+    @staticmethod
+    def prune_dominated_sets(sets: List[frozenset]) -> List[frozenset]:
+        kept_sets = []
+
+        # The indices of the kept sets containing each node.
+        containing_sets = {}
+
+        # A set can only be contained in a set at least as large, which is visited first.
+        for candidate in sorted(set(sets), key=len, reverse=True):
+            supersets = None
+            for name in sorted(candidate, key=lambda item: len(containing_sets.get(item, ()))):
+                supersets = set(containing_sets.get(name, ())) if supersets is None else \
+                    supersets.intersection(containing_sets.get(name, ()))
+                if len(supersets) == 0:
+                    break
+
+            if supersets is None or len(supersets) == 0:
+                for name in candidate:
+                    containing_sets.setdefault(name, set()).add(len(kept_sets))
+                kept_sets.append(candidate)
+
+        return kept_sets
+
     def flag_nodes(self) -> set:
         """
             Classes that inherit from the `NodesOptimizer` class (such as `MKP` and various baselines) should override
@@ -4,7 +4,7 @@
 # Copyright 2021-2022 University of Illinois
 
 from core.algorithm.optimize_nodes.nodes_optimizer import NodesOptimizer
-from core.utils import compute_peak_memory_usage
+from core.algorithm.memory_profile import MemoryProfile
 
 import numpy as np
 
@@ -22,17 +22,15 @@ class FlagNodesRandom(NodesOptimizer):
 
     def flag_nodes(self) -> set:
         nodes_to_flag_names = set()
+        memory_profile = MemoryProfile(self.graph, self.execution_order, self.node_sizes)
         # iterate through nodes in random order
         for name in np.random.permutation(self.execution_order):
             if name in self.nodes_to_exclude:
                 continue
 
-            peak_memory_usage = compute_peak_memory_usage(self.graph, self.execution_order, self.node_sizes,
-                                                          nodes_to_flag_names.union({name}))
-
             # flag node if current memory usage allows
-            if (peak_memory_usage <= self.memory_limit and
-                    name not in self.nodes_to_exclude):
+            if memory_profile.fits(name, self.memory_limit):
+                memory_profile.add(name)
                 nodes_to_flag_names.add(name)
 
         return nodes_to_flag_names
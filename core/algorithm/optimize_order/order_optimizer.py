@@ -4,6 +4,8 @@
 # Copyright 2021-2022 University of Illinois
 from typing import List
 
+from core.algorithm.compact_graph import CompactGraph
+
 
 class OrderOptimizer(object):
     """
@@ -20,10 +22,14 @@ class OrderOptimizer(object):
         self.memory_limit = None
         self.node_scores = None
         self.node_sizes = None
+        self.compact_graph = None
         self.debug = debug
 
         self.memory_usage = None
 
+        # Memory usage of each node indexed by its id in the compact graph.
+        self.memory_usage_array = None
+
     """
         Initializes the OrderOptimizer with the execution graph and related information.
 
@@ -36,12 +42,16 @@ class OrderOptimizer(object):
                 the estimated time savings of flagging each node
             node_sizes (Dict):
                 the estimated sizes of each node
+            compact_graph (CompactGraph):
+                the integer-indexed copy of the graph; built from the graph if not given.
         """
-    def set_graph(self, graph, memory_limit, node_scores, node_sizes):
+    def set_graph(self, graph, memory_limit, node_scores, node_sizes, compact_graph: CompactGraph = None):
         self.graph = graph
         self.memory_limit = memory_limit
         self.node_scores = node_scores
         self.node_sizes = node_sizes
+        self.compact_graph = compact_graph if compact_graph is not None else \
+            CompactGraph(graph, node_sizes, node_scores)
 
     """
         Sets the flagged nodes for the current iteration.
@@ -53,6 +63,7 @@ class OrderOptimizer(object):
         # it is stored in memory or not (i.e. if it iss not, then the usage is 0)
         self.memory_usage = {name: int(name in self.flagged_nodes_names) * self.node_sizes[name]
                              for name in self.graph.nodes}
+        self.memory_usage_array = self.compact_graph.sizes * self.compact_graph.to_flags(self.flagged_nodes_names)
 
     """
         Sets the current execution order (i.e. order prior to optimization). Used by certain optimization methods.
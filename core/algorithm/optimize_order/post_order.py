@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from typing import List
+
+from core.algorithm.optimize_order.order_optimizer import OrderOptimizer
+from core.algorithm.optimize_order.ma_dfs import OptimizeOrderMADFS
+
+
+class OptimizeOrderPostOrder(OrderOptimizer):
+    """
+        Computes the new execution order as a post-order of tree-shaped workloads, i.e. graphs where the result of each
+        node is read by at most one other node (an in-forest): the subtree of each node runs contiguously, ending with
+        the node. These are the orders `FlagNodesDP` solves exactly. The inputs of each node run in decreasing order of
+        the peak memory usage of their subtree minus their own memory usage, which minimizes the peak memory usage over
+        post-orders.
+
+        Other graphs have no post-order and are handed to the fallback order optimizer.
+
+        Args:
+            debug (bool):
+                whether to print debug messages during optimization.
+            fallback (OrderOptimizer):
+                the order optimizer used on graphs which are not in-forests; `OptimizeOrderMADFS` by default.
+    """
+    def __init__(self, debug=False, fallback=None):
+        super().__init__(debug)
+        self.fallback = fallback if fallback is not None else OptimizeOrderMADFS(debug)
+
+    def set_graph(self, graph, memory_limit, node_scores, node_sizes, compact_graph=None):
+        super().set_graph(graph, memory_limit, node_scores, node_sizes, compact_graph)
+        self.fallback.set_graph(graph, memory_limit, node_scores, node_sizes, self.compact_graph)
+
+    def set_flagged_nodes(self, flagged_nodes_names):
+        super().set_flagged_nodes(flagged_nodes_names)
+        self.fallback.set_flagged_nodes(flagged_nodes_names)
+
+    def set_cur_execution_order(self, cur_execution_order):
+        super().set_cur_execution_order(cur_execution_order)
+        self.fallback.set_cur_execution_order(cur_execution_order)
+
+    def optimize_order(self) -> List[str]:
+        if any(self.graph.out_degree(name) > 1 for name in self.cur_execution_order):
+            if self.debug:
+                print("Graph is not an in-forest, using the fallback")
+            return self.fallback.optimize_order()
+
+        position = {name: i for i, name in enumerate(self.cur_execution_order)}
+
+        # The peak memory usage of the subtree of each node when run contiguously, and the order of its inputs.
+        peak = {}
+        input_names = {}
+
+        def input_key(item):
+            return -(peak[item] - self.memory_usage[item]), position[item]
+
+        for name in self.cur_execution_order:
+            input_names[name] = sorted(self.graph.predecessors(name), key=input_key)
+
+            # The inputs which already ran are resident while the next one runs, and all of them when the node does.
+            resident = 0
+            peak[name] = 0
+            for input_name in input_names[name]:
+                peak[name] = max(peak[name], resident + peak[input_name])
+                resident += self.memory_usage[input_name]
+            peak[name] = max(peak[name], resident + self.memory_usage[name])
+
+        # Outputs are never freed, hence they are ordered like the inputs of a virtual node after the end of the order.
+        output_names = sorted([name for name in self.cur_execution_order if self.graph.out_degree(name) == 0],
+                              key=input_key)
+
+        execution_order = []
+        stack = [(name, False) for name in reversed(output_names)]
+        while len(stack) > 0:
+            name, expanded = stack.pop()
+            if expanded:
+                execution_order.append(name)
+                continue
+
+            stack.append((name, True))
+            stack.extend((input_name, False) for input_name in reversed(input_names[name]))
+
+        return execution_order
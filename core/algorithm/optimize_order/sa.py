@@ -5,126 +5,276 @@
 from typing import List
 
 from core.algorithm.optimize_order.order_optimizer import OrderOptimizer
-from core.utils import compute_peak_memory_usage
+from concurrent.futures import ProcessPoolExecutor
 import random
 import math
+import numpy as np
+import time
 
 
-class OptimizeOrderSA(OrderOptimizer):
+class AnnealingChain(object):
     """
-        Computes the new execution order via simulated annealing (SA), i.e. temperature-based hill climbing.
-        The metric used here is the storage-time product with unit execution time assumption.
+        A single simulated annealing chain over execution orders. The order and the position of each node are kept in
+        arrays indexed by node id of the compact graph, together with the memory profile of the order, i.e. the bytes
+        resident at each position. Moving a node only changes the profile between its old and new positions, so the
+        peak memory usage of a move is computed from that window alone.
+
+        The chain is self-contained so it can be sent to a worker process.
 
         Args:
-            debug (bool):
-                whether to print debug messages during optimization.
-            num_iters (int):
-                number of iterations of simulated annealing to run.
+            compact_graph (CompactGraph): the integer-indexed execution graph.
+            memory_usage (np.ndarray): the memory usage of each node, i.e. its size if it is flagged and 0 otherwise.
+            memory_limit (int): the spare memory size in bytes.
+            order (np.ndarray): the initial execution order as node ids.
     """
-    def __init__(self, debug=False, num_iters=10000):
-        super().__init__(debug)
-        self.num_iters = num_iters
+    def __init__(self, compact_graph, memory_usage, memory_limit, order):
+        self.compact_graph = compact_graph
+        self.memory_usage = memory_usage
+        self.memory_limit = memory_limit
+        self.initial_order = order
+
+        # Higher temperature leads to higher probability of picking a worse
+        # solution at any time step.
+        self.temperature = float(memory_usage.max(initial=0)) / max(len(memory_usage), 1)
+
+        self.order = None
+        self.position = None
+        self.profile = None
+
+    """
+        Start the chain from an order, computing the positions and the memory profile.
+    """
+    def reset(self, order):
+        self.order = np.array(order, dtype=np.int64)
+        self.position = np.zeros(self.compact_graph.num_nodes, dtype=np.int64)
+        self.position[self.order] = np.arange(len(self.order))
+        self.profile = self.compute_profile(self.order, 0, 0.0)
+
+    """
+    Computes the memory profile of a contiguous part of the order, matching `compute_memory_profile`. An input is
+    freed after the position of its last consumer; inputs whose last consumer is beyond the part are not freed.
+
+    Args:
+        part (np.ndarray): the node ids of the part, in order.
+        start (int): the position the part starts at.
+        resident (float): the bytes resident entering the part.
+    """
+    def compute_profile(self, part, start, resident) -> np.ndarray:
+        compact_graph = self.compact_graph
+        part_position = self.position.copy()
+        part_position[part] = np.arange(start, start + len(part))
+
+        # The last consumer of each input of the part, if it is within the part.
+        consumers, inputs = compact_graph.gather_parents(part)
+        last_consumer = np.full(compact_graph.num_nodes, -1, dtype=np.int64)
+        np.maximum.at(last_consumer, inputs, part_position[consumers])
+        inputs = np.unique(inputs)
+        _, input_children = compact_graph.gather_children(inputs)
+        child_counts = np.diff(compact_graph.child_offsets)[inputs]
+        outside_end = np.maximum.reduceat(part_position[input_children], np.cumsum(child_counts) - child_counts) \
+            if len(inputs) > 0 else np.empty(0, dtype=np.int64)
+        freed = inputs[(outside_end < start + len(part)) & (self.memory_usage[inputs] > 0)]
+
+        frees = np.bincount(last_consumer[freed] - start, self.memory_usage[freed], len(part))
+        return resident + np.cumsum(self.memory_usage[part]) - np.concatenate(([0.0], np.cumsum(frees)[:-1]))
 
     """
     Computes the change in storage-time product resulting from moving node_to_move to new_node_pos.
     """
-    def stp_change(self, node_idx_to_name, node_name_to_idx, node_to_move, new_node_pos):
-        old_node_pos = node_name_to_idx[node_to_move]
-        change = 0
+    def stp_change(self, node_to_move, new_node_pos):
+        compact_graph = self.compact_graph
+        memory_usage = self.memory_usage
+        position = self.position
+        old_node_pos = position[node_to_move]
 
         # Effect on neighbors
-        for parent_name in self.graph.predecessors(node_to_move):
-            change += (new_node_pos - old_node_pos) * self.memory_usage[parent_name]
-        for child_name in self.graph.successors(node_to_move):
-            change -= (new_node_pos - old_node_pos) * self.memory_usage[child_name]
+        change = (new_node_pos - old_node_pos) * (memory_usage[compact_graph.parents(node_to_move)].sum() -
+                                                  memory_usage[compact_graph.children(node_to_move)].sum())
 
         # Compute change caused by moving node
-        for i in range(min(new_node_pos, old_node_pos) + int(old_node_pos < new_node_pos),
-                       max(new_node_pos, old_node_pos) + int(old_node_pos < new_node_pos)):
-            for parent_name in self.graph.predecessors(node_idx_to_name[i]):
-                if node_name_to_idx[parent_name] < old_node_pos:
-                    change -= self.memory_usage[parent_name]
-            for child_name in self.graph.successors(node_idx_to_name[i]):
-                if node_name_to_idx[child_name] > new_node_pos:
-                    change += self.memory_usage[child_name]
+        moved_nodes = self.order[min(new_node_pos, old_node_pos) + int(old_node_pos < new_node_pos):
+                                 max(new_node_pos, old_node_pos) + int(old_node_pos < new_node_pos)]
+        _, parents = compact_graph.gather_parents(moved_nodes)
+        change -= memory_usage[parents[position[parents] < old_node_pos]].sum()
+        _, children = compact_graph.gather_children(moved_nodes)
+        change += memory_usage[children[position[children] > new_node_pos]].sum()
 
-        return change
+        return float(change)
 
     """
-    Applies the specified node movement by moving node_to_move to new_node_pos and
-    updates the 2 dictionaries accordingly.
-    """
-    @staticmethod
-    def stp_apply(node_idx_to_name, node_name_to_idx, node_to_move, new_node_pos):
-        old_node_pos = node_name_to_idx[node_to_move]
+    Computes the memory profile between the old and new positions of node_to_move if it were moved to new_node_pos.
+    The profile elsewhere is unchanged.
 
+    Returns:
+        window_start: the first position of the changed window.
+        window_profile: the bytes resident at each position of the window.
+    """
+    def window_profile(self, node_to_move, new_node_pos):
+        old_node_pos = self.position[node_to_move]
         if new_node_pos > old_node_pos:
-            for i in range(old_node_pos + 1, new_node_pos + 1):
-                i_name = node_idx_to_name[i]
-                node_name_to_idx[i_name] = i - 1
-                node_idx_to_name[i - 1] = i_name
+            window_start = old_node_pos
+            window_order = np.append(self.order[old_node_pos + 1:new_node_pos + 1], node_to_move)
+        else:
+            window_start = new_node_pos
+            window_order = np.insert(self.order[new_node_pos:old_node_pos], 0, node_to_move)
+
+        # Bytes resident entering the window
+        resident = self.profile[window_start] - self.memory_usage[self.order[window_start]]
+        return window_start, self.compute_profile(window_order, window_start, resident)
+
+    """
+    Applies the specified node movement by moving node_to_move to new_node_pos and updates the positions and the
+    memory profile of the window accordingly.
+    """
+    def stp_apply(self, node_to_move, new_node_pos, window_start, window_profile):
+        old_node_pos = self.position[node_to_move]
 
+        # Shift the nodes in between by one position
+        if new_node_pos > old_node_pos:
+            self.order[old_node_pos:new_node_pos] = self.order[old_node_pos + 1:new_node_pos + 1]
         else:
-            for i in range(old_node_pos - 1, new_node_pos - 1, -1):
-                i_name = node_idx_to_name[i]
-                node_name_to_idx[i_name] = i + 1
-                node_idx_to_name[i + 1] = i_name
+            self.order[new_node_pos + 1:old_node_pos + 1] = self.order[new_node_pos:old_node_pos]
+        self.order[new_node_pos] = node_to_move
 
-        node_name_to_idx[node_to_move] = new_node_pos
-        node_idx_to_name[new_node_pos] = node_to_move
+        lo, hi = min(old_node_pos, new_node_pos), max(old_node_pos, new_node_pos)
+        self.position[self.order[lo:hi + 1]] = np.arange(lo, hi + 1)
+        self.profile[window_start:window_start + len(window_profile)] = window_profile
 
-    def optimize_order(self) -> List[str]:
-        # Set up dictionaries for fast lookup
-        node_name_to_idx = {}
-        node_idx_to_name = {}
-        for i in range(len(self.cur_execution_order)):
-            node_name_to_idx[self.cur_execution_order[i]] = i
-            node_idx_to_name[i] = self.cur_execution_order[i]
+    """
+    Runs the chain from its initial order.
+
+    Args:
+        seed (int): the seed of the random moves.
+        num_iters (int): the maximum number of iterations.
+        deadline (float): the wall-clock time to stop at, or None.
+        restart_iters (int): the number of iterations without improvement after which the chain restarts from its
+            best order with the initial temperature, or None to never restart.
+
+    Returns:
+        best_score: the best reduction of the storage-time product found.
+        best_order: the order with the best score.
+        iterations: the number of iterations run.
+    """
+    def run(self, seed, num_iters, deadline=None, restart_iters=None):
+        rng = random.Random(seed)
+        self.reset(self.initial_order)
+        num_nodes = len(self.order)
 
         best_score = 0
-        best_order = self.cur_execution_order
+        best_order = self.order.copy()
         cur_score = 0
-        scores = []
+        iters_since_improvement = 0
+        iters_since_restart = 0
 
-        # Higher temperature leads to higher probability of picking a worse
-        # solution at any time step.
-        temperature = \
-            max(list(self.memory_usage.values())) / len(list(self.memory_usage.values()))
+        for i in range(num_iters):
+            if deadline is not None and i % 100 == 0 and time.time() >= deadline:
+                return best_score, best_order, i
+
+            # Restart from the best order
+            if restart_iters is not None and iters_since_improvement >= restart_iters:
+                self.reset(best_order)
+                cur_score = best_score
+                iters_since_improvement = 0
+                iters_since_restart = 0
+            iters_since_improvement += 1
+            iters_since_restart += 1
 
-        for i in range(self.num_iters):
             # Select some random node
-            u = random.randint(0, len(self.cur_execution_order) - 1)
-            max_parent = max([node_name_to_idx[p] for p in self.graph.predecessors(node_idx_to_name[u])], default=0)
-            min_child = min([node_name_to_idx[c] for c in self.graph.successors(node_idx_to_name[u])],
-                            default=len(self.cur_execution_order) - 1)
+            u = rng.randint(0, num_nodes - 1)
+            node = int(self.order[u])
+            max_parent = int(self.position[self.compact_graph.parents(node)].max(initial=0))
+            min_child = int(self.position[self.compact_graph.children(node)].min(initial=num_nodes - 1))
 
             # Current node cannot be swapped
             if min_child - max_parent <= 2:
                 continue
 
             # Randomly select a valid position for swapping
-            v = random.randint(max_parent + 1, min_child - 1)
+            v = rng.randint(max_parent + 1, min_child - 1)
 
             # Evaluate swap
-            score_change = self.stp_change(node_idx_to_name, node_name_to_idx, node_idx_to_name[u], v)
+            score_change = self.stp_change(node, v)
 
             # Metropolis
-            t = temperature / float(i + 1)
+            t = self.temperature / float(iters_since_restart)
+            if not (score_change > 0 or (t > 0 and rng.random() < math.exp(score_change / t))):
+                continue
+
+            # Reject the move if the order violates memory limit
+            window_start, window_profile = self.window_profile(node, v)
+            window_end = window_start + len(window_profile)
+            if window_profile.max() > self.memory_limit or \
+                    self.profile[:window_start].max(initial=0) > self.memory_limit or \
+                    self.profile[window_end:].max(initial=0) > self.memory_limit:
+                continue
+
+            self.stp_apply(node, v, window_start, window_profile)
+            cur_score += score_change
+            if cur_score > best_score:
+                best_score = cur_score
+                best_order = self.order.copy()
+                iters_since_improvement = 0
+
+        return best_score, best_order, num_iters
+
 
-            if (score_change > 0 or
-                    random.random() < math.exp(score_change / t)):
-                self.stp_apply(node_idx_to_name, node_name_to_idx, node_idx_to_name[u], v)
+class OptimizeOrderSA(OrderOptimizer):
+    """
+        Computes the new execution order via simulated annealing (SA), i.e. temperature-based hill climbing.
+        The metric used here is the storage-time product with unit execution time assumption.
+
+        Several independent chains with different seeds can run in parallel in worker processes, each restarting from
+        its best order when it stops improving; the best order over all chains is returned.
+
+        Args:
+            debug (bool):
+                whether to print debug messages during optimization.
+            num_iters (int):
+                number of iterations of simulated annealing to run per chain.
+            num_chains (int):
+                number of independent chains; chains run in a process pool if there are more than 1.
+            time_limit (float):
+                wall-clock budget in seconds, after which all chains stop; None to only limit the iterations.
+            restart_iters (int):
+                number of iterations without improvement after which a chain restarts from its best order; None to
+                never restart.
+            seed (int):
+                the seed of the first chain; chain k uses seed + k. None for random seeds.
+    """
+    def __init__(self, debug=False, num_iters=10000, num_chains=1, time_limit=None, restart_iters=None, seed=None):
+        super().__init__(debug)
+        self.num_iters = num_iters
+        self.num_chains = num_chains
+        self.time_limit = time_limit
+        self.restart_iters = restart_iters
+        self.seed = seed
+
+        # Total number of iterations run by all chains in the last optimization.
+        self.iterations = None
+
+    def optimize_order(self) -> List[str]:
+        compact_graph = self.compact_graph
+        chain = AnnealingChain(compact_graph, self.memory_usage_array, self.memory_limit,
+                               compact_graph.to_ids(self.cur_execution_order))
+
+        seed = self.seed if self.seed is not None else random.randrange(2 ** 32)
+        seeds = [seed + k for k in range(self.num_chains)]
+        deadline = time.time() + self.time_limit if self.time_limit is not None else None
+
+        if self.num_chains > 1:
+            with ProcessPoolExecutor(max_workers=self.num_chains) as executor:
+                futures = [executor.submit(chain.run, chain_seed, self.num_iters, deadline, self.restart_iters)
+                           for chain_seed in seeds]
+                results = [future.result() for future in futures]
+        else:
+            results = [chain.run(seeds[0], self.num_iters, deadline, self.restart_iters)]
 
-                # Revert change if the order violates memory limit
-                cur_order = [v for k, v in sorted(node_idx_to_name.items())]
-                if compute_peak_memory_usage(self.graph, cur_order, self.node_sizes, self.flagged_nodes_names) \
-                        > self.memory_limit:
-                    self.stp_apply(node_idx_to_name, node_name_to_idx, node_idx_to_name[v], u)
+        self.iterations = sum(result[2] for result in results)
+        best_score, best_order, _ = max(results, key=lambda result: result[0])
 
-                else:
-                    cur_score += score_change
-                    if cur_score > best_score:
-                        best_score = cur_score
-                        best_order = [v for k, v in sorted(node_idx_to_name.items())]
+        if self.debug:
+            print("SA iterations:", self.iterations, "best score:", best_score)
 
-        return best_order
+        if best_score <= 0:
+            return self.cur_execution_order
+        return compact_graph.to_names(best_order)
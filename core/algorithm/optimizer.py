@@ -4,6 +4,7 @@
 # Copyright 2021-2022 University of Illinois
 
 
+from core.algorithm.compact_graph import CompactGraph
 from core.algorithm.optimize_nodes.nodes_optimizer import NodesOptimizer
 from core.algorithm.optimize_order.order_optimizer import OrderOptimizer
 from core.utils import compute_peak_memory_usage
@@ -41,6 +42,9 @@ class Optimizer(object):
         self.node_sizes = None
         self.node_scores = None
 
+        # Integer-indexed copy of the graph shared by the 2 subproblem optimizers.
+        self.compact_graph = None
+
         # Nodes to trivially exclude from storing in memory computed after ExecutionGraph initialization.
         self.nodes_to_exclude = None
 
@@ -66,11 +70,15 @@ class Optimizer(object):
                     self.node_scores[name] == 0):
                 self.nodes_to_exclude.add(name)
 
+        # Build the compact graph once for both optimizers.
+        self.compact_graph = CompactGraph(self.execution_graph.graph, self.node_sizes, self.node_scores)
+
         # Sets the graph into the 2 subproblem optimizers.
         self.nodes_optimizer.set_graph(
-            self.execution_graph.graph, self.memory_limit, self.node_scores, self.node_sizes, self.nodes_to_exclude)
+            self.execution_graph.graph, self.memory_limit, self.node_scores, self.node_sizes, self.nodes_to_exclude,
+            self.compact_graph)
         self.order_optimizer.set_graph(
-            self.execution_graph.graph, self.memory_limit, self.node_scores, self.node_sizes)
+            self.execution_graph.graph, self.memory_limit, self.node_scores, self.node_sizes, self.compact_graph)
 
     """
         Run the EM algorithm for joint optimization of execution order & nodes to store in memory.
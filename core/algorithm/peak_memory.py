@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from core.algorithm.compact_graph import CompactGraph
+
+import numpy as np
+
+
+class PeakMemoryEvaluator(object):
+    """
+        Evaluates the peak memory usage of many candidate plans at once, for search-based optimizers which try many
+        sets of flagged nodes or execution orders. A flagged node is resident over its live interval, from its own
+        position to the position of its last downstream node (to the end of the order if it has none), matching
+        `compute_peak_memory_usage`.
+
+        The memory profiles of a batch of candidates are built as difference arrays with a single `bincount`, then
+        summed up with a `cumsum`, so a batch is evaluated without a Python loop over nodes or positions.
+
+        Args:
+            compact_graph (CompactGraph):
+                the integer-indexed execution graph.
+            max_batch_cells (int):
+                the maximum size of the candidates × positions arrays built at once; larger batches are evaluated in
+                chunks to bound memory.
+    """
+    def __init__(self, compact_graph: CompactGraph, max_batch_cells=10000000):
+        self.compact_graph = compact_graph
+        self.max_batch_cells = max_batch_cells
+
+        # Nodes with at least one child, and where their children start in the CSR index array.
+        self.has_children = np.diff(compact_graph.child_offsets) > 0
+        self.child_starts = compact_graph.child_offsets[:-1][self.has_children]
+
+        # Live intervals of the current execution order, shared by candidates which do not give their own order.
+        self.starts = None
+        self.ends = None
+
+    """
+        Sets the execution order candidates are evaluated with when they do not give their own, precomputing the live
+        intervals of its nodes.
+    """
+    def set_execution_order(self, execution_order):
+        self.starts, self.ends = self.intervals(self.compact_graph.to_ids(execution_order)[None, :])
+
+    """
+        Compute the live intervals of all nodes in each of a batch of execution orders.
+
+        Args:
+            orders (np.ndarray): a candidates × nodes matrix, each row listing node ids in execution order.
+
+        Returns:
+            starts: a candidates × nodes matrix of the position of each node.
+            ends: a candidates × nodes matrix of the last position each node is resident at.
+    """
+    def intervals(self, orders: np.ndarray):
+        num_candidates, num_nodes = orders.shape
+
+        starts = np.empty_like(orders)
+        starts[np.arange(num_candidates)[:, None], orders] = np.arange(num_nodes)
+
+        ends = np.full_like(orders, num_nodes - 1)
+        if len(self.child_starts) > 0:
+            ends[:, self.has_children] = np.maximum.reduceat(starts[:, self.compact_graph.child_indices],
+                                                             self.child_starts, axis=1)
+
+        return starts, ends
+
+    """
+        Compute the peak memory usage of a batch of candidate plans.
+
+        Args:
+            flags (np.ndarray): a candidates × nodes boolean matrix of the flagged nodes of each candidate, indexed by
+                node id. A single vector is evaluated as a batch of one.
+            orders (np.ndarray): a candidates × nodes matrix of the execution order of each candidate as node ids, a
+                single order shared by all candidates, or None to use the order set by `set_execution_order`.
+
+        Returns:
+            peaks: the peak memory usage of each candidate.
+    """
+    def evaluate(self, flags: np.ndarray, orders: np.ndarray = None) -> np.ndarray:
+        flags = np.atleast_2d(np.asarray(flags, dtype=bool))
+        num_nodes = self.compact_graph.num_nodes
+
+        # A shared order only needs its intervals computed once.
+        if orders is None:
+            if self.starts is None:
+                raise ValueError("No execution order given; pass orders or call set_execution_order first")
+            starts, ends = self.starts, self.ends
+        else:
+            orders = np.atleast_2d(np.asarray(orders, dtype=np.int64))
+            if orders.shape[0] == 1:
+                starts, ends = self.intervals(orders)
+            else:
+                starts, ends = None, None
+
+        chunk_size = max(self.max_batch_cells // (num_nodes + 1), 1)
+        peaks = np.zeros(flags.shape[0])
+        for chunk_start in range(0, flags.shape[0], chunk_size):
+            chunk = slice(chunk_start, chunk_start + chunk_size)
+            if starts is None:
+                chunk_starts, chunk_ends = self.intervals(orders[chunk])
+            else:
+                chunk_starts, chunk_ends = starts, ends
+            peaks[chunk] = self.evaluate_chunk(flags[chunk], chunk_starts, chunk_ends)
+
+        return peaks
+
+    """
+        Compute the peak memory usage of candidates given the live intervals of their nodes.
+    """
+    def evaluate_chunk(self, flags: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        num_candidates, num_nodes = flags.shape
+        weights = (flags * self.compact_graph.sizes).ravel()
+
+        # Each node adds its size at its position and removes it after its last resident position.
+        row_offsets = (np.arange(num_candidates) * (num_nodes + 1))[:, None]
+        cells = num_candidates * (num_nodes + 1)
+        deltas = np.bincount((np.broadcast_to(starts, flags.shape) + row_offsets).ravel(), weights, cells) - \
+            np.bincount((np.broadcast_to(ends, flags.shape) + 1 + row_offsets).ravel(), weights, cells)
+
+        profiles = np.cumsum(deltas.reshape(num_candidates, num_nodes + 1), axis=1)[:, :num_nodes]
+        return profiles.max(axis=1, initial=0)
+
+    """
+        Compute the peak memory usage of a single plan given by node names.
+    """
+    def evaluate_names(self, flagged_node_names, execution_order) -> float:
+        return float(self.evaluate(self.compact_graph.to_flags(flagged_node_names),
+                                   self.compact_graph.to_ids(execution_order))[0])
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+
+
+class Backend(object):
+
+    """
+        The interface of an execution backend, i.e. a SQL engine with a disk catalog and an in-memory catalog. The
+        execution graph and its nodes only talk to the engine through a backend and the cursors it hands out.
+
+        Statements are written in the dialect of the workload (Presto); a backend translates them to its engine.
+        Tables in the in-memory catalog are addressed by prefixing their names with the in-memory prefix.
+
+    Args:
+        inmemory_prefix (str): the prefix for the schema of the in-memory catalog.
+        sample_clause (str): the clause sampling a base table in sampled profiling; {percent} is replaced by the
+            sampling percentage.
+    """
+    def __init__(self, inmemory_prefix: str, sample_clause: str):
+        self.inmemory_prefix = inmemory_prefix
+        self.sample_clause = sample_clause
+
+    """
+        Open a new DB-API connection to the engine, e.g. for a connection pool.
+    """
+    def connect(self):
+        raise NotImplementedError
+
+    """
+        Execute a SQL statement.
+
+        Args:
+            cursor: a cursor of a connection opened by this backend.
+            sql (str): the statement to execute.
+            block (bool): whether to wait for the statement to complete.
+
+        Returns:
+            rows: the rows of the result if blocking, None otherwise.
+    """
+    def execute(self, cursor, sql: str, block=True):
+        raise NotImplementedError
+
+    """
+        The statistics of the last statement executed on a cursor.
+
+        Args:
+            cursor: a cursor of a connection opened by this backend.
+
+        Returns:
+            stats: a dict of the elapsed time in seconds ("elapsed_time"), and the number of bytes and rows processed
+                ("processed_bytes", "processed_rows").
+    """
+    def stats(self, cursor) -> dict:
+        raise NotImplementedError
+
+    """
+        Rewrite a statement creating a table on disk to create it in the in-memory catalog instead, i.e. drop its
+        storage properties. The name of the created table is prefixed by the caller.
+
+        Args:
+            sql (str): the statement creating the table.
+    """
+    def inmemory_sql(self, sql: str) -> str:
+        raise NotImplementedError
+
+    """
+        The statement writing an in-memory table to disk.
+
+        Args:
+            table_name (str): the name of the table on disk.
+            inmemory_table_name (str): the name of the table in the in-memory catalog.
+    """
+    def materialize_sql(self, table_name: str, inmemory_table_name: str) -> str:
+        raise NotImplementedError
+
+    """
+        Drop a table if it exists.
+
+        Args:
+            cursor: a cursor of a connection opened by this backend.
+            table_name (str): the name of the table, prefixed if in the in-memory catalog.
+            block (bool): whether to wait for the table to be dropped.
+    """
+    def drop(self, cursor, table_name: str, block=True):
+        self.execute(cursor, "DROP TABLE IF EXISTS " + table_name, block)
+
+    """
+        Estimate the size of a table.
+
+        Args:
+            cursor: a cursor of a connection opened by this backend.
+            table_name (str): the name of the table.
+
+        Returns:
+            size: the estimated size of the table in bytes and its number of rows.
+    """
+    def table_size(self, cursor, table_name: str) -> tuple:
+        raise NotImplementedError
+
+    """
+        Measure the size of a table in the in-memory catalog.
+
+        Args:
+            cursor: a cursor of a connection opened by this backend.
+            table_name (str): the prefixed name of the table.
+
+        Returns:
+            size: the size of the table in bytes, or None if the engine does not report it.
+    """
+    def inmemory_table_size(self, cursor, table_name: str):
+        raise NotImplementedError
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+import re
+import time
+
+import duckdb
+
+from core.backend.backend import Backend
+
+# Storage properties of Presto statements, which DuckDB does not accept.
+DISK_FORMAT_PATTERN = re.compile(r"with\s*\(\s*format\s*=\s*'PARQUET'\s*\)", re.IGNORECASE)
+
+# Width in bytes of fixed-width column types; other types are measured by the length of their values.
+TYPE_WIDTHS = {"BOOLEAN": 1, "TINYINT": 1, "SMALLINT": 2, "INTEGER": 4, "BIGINT": 8, "HUGEINT": 16, "UTINYINT": 1,
+               "USMALLINT": 2, "UINTEGER": 4, "UBIGINT": 8, "FLOAT": 4, "REAL": 4, "DOUBLE": 8, "DATE": 4,
+               "TIME": 8, "TIMESTAMP": 8, "DECIMAL": 8}
+
+
+class LocalCursor(object):
+
+    """
+        A DuckDB cursor recording the elapsed time of each statement, as DuckDB does not report query statistics.
+
+    Args:
+        cursor (duckdb.DuckDBPyConnection): the DuckDB cursor to wrap.
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.elapsed_time = 0
+        self.rows = None
+
+    def execute(self, sql: str):
+        start_time = time.time()
+        self.rows = self.cursor.execute(DISK_FORMAT_PATTERN.sub("", sql)).fetchall()
+        self.elapsed_time = time.time() - start_time
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        self.cursor.close()
+
+
+class LocalConnection(object):
+
+    """
+        A connection to the local database, handing out a single cursor.
+    """
+    def __init__(self, cursor):
+        self.local_cursor = LocalCursor(cursor)
+
+    def cursor(self) -> LocalCursor:
+        return self.local_cursor
+
+    def close(self):
+        self.local_cursor.close()
+
+
+class LocalBackend(Backend):
+
+    """
+        An in-process DuckDB engine for running workloads without a Presto cluster. A file-backed database plays the
+        Hive catalog on disk, and an attached in-memory database plays the memory connector. Statements execute
+        synchronously, so writes submitted without blocking complete before returning.
+
+    Args:
+        path (str): the database file holding the base tables and the tables created on disk.
+        inmemory_catalog (str): the name of the attached in-memory database.
+    """
+    def __init__(self, path: str, inmemory_catalog="inmemory"):
+        super().__init__(inmemory_catalog + ".", "TABLESAMPLE {percent}% (bernoulli)")
+        self.path = path
+        self.database = duckdb.connect(path)
+        self.database.execute("ATTACH ':memory:' AS " + inmemory_catalog)
+
+    def connect(self) -> LocalConnection:
+        return LocalConnection(self.database.cursor())
+
+    def execute(self, cursor, sql: str, block=True):
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+    def stats(self, cursor) -> dict:
+        return {"elapsed_time": cursor.elapsed_time, "processed_bytes": 0, "processed_rows": 0}
+
+    def inmemory_sql(self, sql: str) -> str:
+        return DISK_FORMAT_PATTERN.sub("", sql)
+
+    def materialize_sql(self, table_name: str, inmemory_table_name: str) -> str:
+        return "CREATE TABLE " + table_name + " AS (SELECT * FROM " + inmemory_table_name + ")"
+
+    """
+        Estimate the table size from the widths of its fixed-width columns and the lengths of the values of its other
+        columns, with a single scan of the table.
+    """
+    def table_size(self, cursor, table_name: str) -> tuple:
+        columns = self.execute(cursor, "DESCRIBE " + table_name)
+
+        fixed_width = 0
+        aggregates = ["COUNT(*)"]
+        for column in columns:
+            column_name, column_type = column[0], column[1].split("(")[0]
+            if column_type in TYPE_WIDTHS:
+                fixed_width += TYPE_WIDTHS[column_type]
+            else:
+                aggregates.append('COALESCE(SUM(strlen(CAST("' + column_name + '" AS VARCHAR))), 0)')
+
+        row = self.execute(cursor, "SELECT " + ", ".join(aggregates) + " FROM " + table_name)[0]
+        return int(row[0] * fixed_width + sum(row[1:])), int(row[0])
+
+    def inmemory_table_size(self, cursor, table_name: str):
+        return self.table_size(cursor, table_name)[0]
+
+    def close(self):
+        self.database.close()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from typing import Callable
+
+from core.backend.backend import Backend
+
+# Storage properties of the tables created on disk (in the Hive catalog).
+DISK_FORMAT_CLAUSE = "with (format = 'PARQUET')"
+
+
+class PrestoBackend(Backend):
+
+    """
+        A Presto cluster, with the Hive catalog on disk and the memory connector as the in-memory catalog.
+
+    Args:
+        connect (Callable): a function opening a new DB-API connection, e.g. a partial of `prestodb.dbapi.connect`.
+        inmemory_prefix (str): the prefix for the schema of the memory connector.
+    """
+    def __init__(self, connect: Callable = None, inmemory_prefix="memory.default."):
+        super().__init__(inmemory_prefix, "TABLESAMPLE BERNOULLI ({percent})")
+        self.connect_func = connect
+
+    def connect(self):
+        return self.connect_func()
+
+    def execute(self, cursor, sql: str, block=True):
+        cursor.execute(sql)
+        if block:
+            return cursor.fetchall()
+
+    def stats(self, cursor) -> dict:
+        return {"elapsed_time": int(cursor.stats['elapsedTimeMillis']) / 1000,
+                "processed_bytes": int(cursor.stats['processedBytes']),
+                "processed_rows": int(cursor.stats.get('processedRows', 0))}
+
+    def inmemory_sql(self, sql: str) -> str:
+        return sql.replace(DISK_FORMAT_CLAUSE, "")
+
+    def materialize_sql(self, table_name: str, inmemory_table_name: str) -> str:
+        return "CREATE TABLE " + table_name + " WITH (format = 'PARQUET') AS (SELECT * FROM " + inmemory_table_name + \
+            ")"
+
+    """
+        Estimate the table size by sending an ANALYZE query to presto. This is a slight overestimation (< 105%) of
+        the actual table size.
+    """
+    def table_size(self, cursor, table_name: str) -> tuple:
+        self.execute(cursor, 'ANALYZE ' + table_name)
+        stats = self.stats(cursor)
+        return stats["processed_bytes"], stats["processed_rows"]
+
+    """
+        Measure the size of an in-memory table from its column statistics.
+    """
+    def inmemory_table_size(self, cursor, table_name: str):
+        rows = self.execute(cursor, 'SHOW STATS FOR ' + table_name)
+
+        # The first two columns are the column name and its data size; the summary row has no column name.
+        data_sizes = [row[1] for row in rows if row[0] is not None and row[1] is not None]
+        return int(sum(data_sizes)) if len(data_sizes) > 0 else None
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from contextlib import contextmanager
+from typing import Callable
+import collections
+import threading
+import time
+
+
+class ConnectionPool(object):
+    """
+        A bounded pool of database connections. Cursors are handed out to the main path, the materialization and
+        garbage collection workers and the dry run, and are returned to the pool for reuse instead of reconnecting.
+
+        Args:
+            connect (Callable):
+                a function opening a new DB-API connection, e.g. a partial of `prestodb.dbapi.connect`.
+            max_connections (int):
+                the maximum number of connections open at once; acquiring blocks while all of them are in use.
+            health_check_query (str):
+                the query used to check that an idle connection is still alive.
+            health_check_interval (float):
+                seconds a connection may stay idle before it is health-checked again on acquire.
+            debug (bool):
+                whether to print debug messages.
+    """
+    def __init__(self, connect: Callable, max_connections=8, health_check_query="SELECT 1",
+                 health_check_interval=60, debug=False):
+        self.connect = connect
+        self.max_connections = max_connections
+        self.health_check_query = health_check_query
+        self.health_check_interval = health_check_interval
+        self.debug = debug
+
+        # Idle (connection, cursor, last used time) entries ready for reuse, most recently used last.
+        self.idle = collections.deque()
+
+        # A mapping from the id of each cursor handed out to its (connection, cursor) entry.
+        self.in_use = {}
+
+        # Number of connections currently open, both idle and in use.
+        self.num_connections = 0
+
+        self.condition = threading.Condition()
+
+    """
+        Check whether the connection behind a cursor is still alive by running the health check query on it.
+
+        Args:
+            cursor: the cursor to check.
+    """
+    def health_check(self, cursor) -> bool:
+        try:
+            cursor.execute(self.health_check_query)
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    """
+        Close a connection, ignoring errors from connections which are already broken.
+    """
+    @staticmethod
+    def close_connection(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    """
+        Hand out a cursor, reusing an idle connection if there is one and opening a new connection otherwise.
+        Blocks while the pool is at its connection cap.
+
+        Args:
+            timeout (float): seconds to wait for a connection to be released; waits forever if None.
+    """
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            with self.condition:
+                while True:
+                    # Take the most recently used idle connection. It still counts towards the cap while it is
+                    # checked.
+                    if self.idle:
+                        entry = self.idle.pop()
+                        break
+
+                    # Open a new connection if the cap allows.
+                    if self.num_connections < self.max_connections:
+                        self.num_connections += 1
+                        entry = None
+                        break
+
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("No connection available in the pool")
+                    self.condition.wait(remaining)
+
+            if entry is None:
+                break
+
+            # Health-check the connection outside of the lock if it has idled for long.
+            connection, cursor, last_used = entry
+            if time.time() - last_used < self.health_check_interval or self.health_check(cursor):
+                with self.condition:
+                    self.in_use[id(cursor)] = (connection, cursor)
+                return cursor
+
+            if self.debug:
+                print("Discarding unhealthy connection")
+            self.close_connection(connection)
+            with self.condition:
+                self.num_connections -= 1
+                self.condition.notify()
+
+        # Connect outside of the lock so other threads are not blocked on the network.
+        try:
+            connection = self.connect()
+            cursor = connection.cursor()
+        except Exception:
+            with self.condition:
+                self.num_connections -= 1
+                self.condition.notify()
+            raise
+
+        if self.debug:
+            print("Opened connection", self.num_connections, "of", self.max_connections)
+
+        with self.condition:
+            self.in_use[id(cursor)] = (connection, cursor)
+        return cursor
+
+    """
+        Return a cursor to the pool for reuse.
+
+        Args:
+            cursor: a cursor handed out by `acquire`.
+            healthy (bool): whether the connection can be reused. If false, the connection is closed.
+            verified (bool): whether the connection is known to be alive. If false, it is health-checked before it is
+                handed out again.
+    """
+    def release(self, cursor, healthy=True, verified=True):
+        with self.condition:
+            connection, cursor = self.in_use.pop(id(cursor))
+            if healthy:
+                # An unverified connection is recorded as idle since forever, so the next acquire checks it.
+                self.idle.append((connection, cursor, time.time() if verified else float('-inf')))
+            else:
+                self.close_connection(connection)
+                self.num_connections -= 1
+            self.condition.notify()
+
+    """
+        Context manager acquiring a cursor and releasing it on exit. If the body raises, the connection may have
+        broken mid-query, so it is health-checked before it is reused.
+
+        Args:
+            timeout (float): seconds to wait for a connection to be released; waits forever if None.
+    """
+    @contextmanager
+    def cursor(self, timeout=None):
+        cursor = self.acquire(timeout)
+        try:
+            yield cursor
+        except BaseException:
+            self.release(cursor, verified=False)
+            raise
+        self.release(cursor)
+
+    """
+        Close all idle connections. Cursors still in use are closed when they are released unhealthy, or left to the
+        caller otherwise.
+    """
+    def close(self):
+        with self.condition:
+            while self.idle:
+                connection, _, _ = self.idle.pop()
+                self.close_connection(connection)
+                self.num_connections -= 1
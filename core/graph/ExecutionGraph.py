@@ -2,15 +2,27 @@
 # -*- coding: utf-8 -*-
 #
 # Copyright 2021-2022 University of Illinois
+import random
 import time
 
-from prestodb.dbapi import Cursor
-
 from core.algorithm.optimizer import Optimizer
+from core.backend.backend import Backend
+from core.backend.presto import PrestoBackend
+from core.connection.pool import ConnectionPool
 from core.graph.ExecutionNode import ExecutionNode
+from core.graph.GarbageCollector import GarbageCollector
+from core.graph.MemoryLedger import MemoryLedger
+from core.graph.ParseCache import ParseCache
+from core.graph.StatisticsCatalog import StatisticsCatalog
+from core.graph.TimeSaveProfiler import TimeSaveProfiler
+from core.graph.Tracer import Tracer, trace_span
+from core.utils import compute_memory_profile, sql_fingerprint
+from core.graph.MaterializationPool import MaterializationPool
 import networkx as nx
+from concurrent.futures import ThreadPoolExecutor
 import threading
 import queue
+import heapq
 
 
 class ExecutionGraph(object):
@@ -19,21 +31,26 @@ class ExecutionGraph(object):
         The ExecutionGraph represents the workload of MVs to refresh.
 
     Args:
-        cursor_main (prestodb.Cursor): a cursor for executing Presto queries.
-        cursor_materialization (prestodb.Cursor): a cursor given to the materialization queue to materialize
-            tables in a separate thread.
-        cursor_gc (prestodb.Cursor): a cursor given to the garbage collection queue to drop in-memory tables
-            when (i) all of its downstream tables have been computed and (ii) it has been materialized to disk.
+        cursor_pool (ConnectionPool): the pool handing out cursors of the backend. Cursors are acquired
+            for the workers creating tables, for the materialization workers and for the garbage collection thread,
+            which drops in-memory tables when (i) all of its downstream tables have been computed and (ii) it has
+            been materialized to disk.
         inmemory_prefix (str): the prefix for the schema of the in-memory catalog to keep tables in.
         workload (str): A set of ';' delimited SQL DDL statements for creating tables/MVs.
         debug (bool): whether to print debug message during execution.
+        parse_cache (ParseCache): cache of parsed statements, saved after the workload is loaded. Statements are
+            parsed directly if None.
+        statistics_catalog (StatisticsCatalog): store of node statistics reused across dry runs. Every node is
+            profiled on each dry run if None.
+        backend (Backend): the backend executing the workload, whose connections the pool holds; Presto if None.
     """
-    def __init__(self, cursor_main: Cursor, cursor_materialization: Cursor, cursor_gc: Cursor, inmemory_prefix: str,
-                 workload: str, debug=False):
-        self.cursor_main = cursor_main
-        self.cursor_materialization = cursor_materialization
-        self.cursor_gc = cursor_gc
+    def __init__(self, cursor_pool: ConnectionPool, inmemory_prefix: str, workload: str, debug=False,
+                 parse_cache: ParseCache = None, statistics_catalog: StatisticsCatalog = None, backend: Backend = None):
+        self.cursor_pool = cursor_pool
+        self.backend = backend if backend is not None else PrestoBackend()
         self.inmemory_prefix = inmemory_prefix
+        self.parse_cache = parse_cache
+        self.statistics_catalog = statistics_catalog
 
         # The graph representation of the current workload.
         self.graph = nx.DiGraph()
@@ -48,37 +65,87 @@ class ExecutionGraph(object):
         self.execution_order = None
         self.flagged_node_names = None
 
-        # Queue & thread for multithreaded materialization of in-memory tables.
-        self.materialization_queue = None
-        self.materialization_thread = None
+        # The memory limit the flagged nodes were chosen under; unbounded until the graph is optimized.
+        self.memory_limit = None
 
-        # Queue & thread for multithreaded garbage collection of in-memory tables.
-        self.gc_queue = None
-        self.gc_thread = None
+        # Nodes actually created in memory during the current execution. This is a subset of the flagged nodes, as a
+        # flagged node is demoted to disk if admitting it would exceed the memory limit.
+        self.inmemory_node_names = set()
 
-        # Split the workload into individual SQL statements
-        sqls = workload.replace('\n', ' ').split(';')
-        for sql in sqls:
-            if sql.isspace() or sql == "":
-                continue
+        # Task & completion queues between the scheduler and the worker threads of the executor.
+        self.task_queue = None
+        self.completion_queue = None
+
+        # Pool of workers for multithreaded materialization of in-memory tables.
+        self.materialization_pool = None
+
+        # Garbage collector of in-memory tables, and the ledger of bytes resident in the in-memory catalog.
+        self.garbage_collector = None
+        self.memory_ledger = MemoryLedger()
+
+        # Measurements of each node created during the last execution: its elapsed time in seconds, bytes processed,
+        # whether it was created on disk, the inputs it read from memory, its estimated table size & the size it was
+        # admitted into memory with (see expected_table_size) when it was scheduled, and its in-memory size if created
+        # in memory.
+        self.execution_records = {}
+
+        # Tracer recording the spans of the current execution, if any.
+        self.tracer = None
 
+        # The bytes resident in the in-memory catalog as each node completed during the last execution, as a list of
+        # (node name, resident bytes) in order of completion.
+        self.measured_memory_profile = []
+
+        # Names of tables referenced by nodes but not (yet) part of the graph, i.e. base tables or tables of
+        # statements still to be added, mapped to the names of the nodes referencing them.
+        self.unresolved_references = {}
+
+        self.load_workload(workload)
+
+    """
+        Split a workload into its individual SQL statements.
+    """
+    @staticmethod
+    def split_statements(workload: str) -> list:
+        return [sql for sql in workload.replace('\n', ' ').split(';') if not (sql.isspace() or sql == "")]
+
+    """
+        Bulk load a workload; all statements are parsed first, then the graph is built in a single linear pass.
+
+        Args:
+            workload (str): A set of ';' delimited SQL DDL statements for creating tables/MVs.
+    """
+    def load_workload(self, workload: str):
+        for sql in self.split_statements(workload):
             # Create an execution node for each SQL statement
-            node = ExecutionNode(sql, self.debug)
+            node = ExecutionNode(sql, self.debug, self.parse_cache, self.backend)
             self.node_dict[node.get_node_name()] = node
             self.graph.add_node(node.get_node_name())
 
             if self.debug:
                 print("Created node for table " + node.get_node_name())
 
-            self.build_graph()
+        self.build_graph()
 
+        if self.parse_cache is not None:
+            self.parse_cache.save()
+
+    """
+        Build the edges, downstream nodes and initial execution order of all nodes in time linear in the size of the
+        workload.
+    """
     def build_graph(self):
-        # Remove base table names from dependencies
-        for node in self.node_dict.values():
-            node.input_node_names = node.get_input_node_names().intersection(set(self.node_dict.keys()))
+        self.unresolved_references = {}
 
-        # Build dependencies; add directed edges between dependencies.
         for node_name, node in self.node_dict.items():
+            # Remove base table names from dependencies
+            node.input_node_names = {name for name in node.get_input_node_names() if name in self.node_dict}
+
+            for table_name in node.referenced_table_names:
+                if table_name not in self.node_dict:
+                    self.unresolved_references.setdefault(table_name, set()).add(node_name)
+
+            # Build dependencies; add directed edges between dependencies.
             for input_node_name in node.get_input_node_names():
                 self.graph.add_edge(input_node_name, node_name)
                 self.node_dict[input_node_name].add_downstream_node(node)
@@ -87,42 +154,298 @@ class ExecutionGraph(object):
         self.execution_order = list(nx.topological_sort(self.graph))
         self.flagged_node_names = set()
 
-        # Queue & thread for multithreaded materialization of in-memory tables.
-        self.materialization_queue = queue.Queue()
-        self.materialization_thread = None
+    """
+        Incrementally add a statement to the graph, linking it to its inputs and to existing nodes referencing it.
+        The execution order is extended in place where possible and only recomputed if the new node must precede a
+        node already in it. Flagged nodes are kept.
+
+        Args:
+            sql (str): The DDL for creating the table/MV.
+    """
+    def add_statement(self, sql: str):
+        node = ExecutionNode(sql, self.debug, self.parse_cache, self.backend)
+        node_name = node.get_node_name()
+        if node_name in self.node_dict:
+            raise ValueError("Table " + node_name + " is already part of the workload")
+
+        self.node_dict[node_name] = node
+        self.graph.add_node(node_name)
+
+        # Link the node to its inputs
+        node.input_node_names = {name for name in node.get_input_node_names() if name in self.node_dict}
+        for table_name in node.referenced_table_names:
+            if table_name not in self.node_dict:
+                self.unresolved_references.setdefault(table_name, set()).add(node_name)
+        for input_node_name in node.get_input_node_names():
+            self.graph.add_edge(input_node_name, node_name)
+            self.node_dict[input_node_name].add_downstream_node(node)
+
+        # Link existing nodes which reference the node as an input
+        downstream_node_names = self.unresolved_references.pop(node_name, set())
+        for downstream_node_name in downstream_node_names:
+            downstream_node = self.node_dict[downstream_node_name]
+            downstream_node.input_node_names.add(node_name)
+            self.graph.add_edge(node_name, downstream_node_name)
+            node.add_downstream_node(downstream_node)
+
+        if self.debug:
+            print("Added node for table " + node_name)
+
+        # Extend the execution order; the node can run last if nothing depends on it, or right before its first
+        # downstream node if all of its inputs run before that.
+        if len(downstream_node_names) == 0:
+            self.execution_order.append(node_name)
+            return
 
-        # Queue & thread for multithreaded garbage collection of in-memory tables.
-        self.gc_queue = queue.Queue()
-        self.gc_thread = None
+        order_position = {name: i for i, name in enumerate(self.execution_order)}
+        first_downstream_position = min(order_position[name] for name in downstream_node_names)
+        if all(order_position[name] < first_downstream_position for name in node.get_input_node_names()):
+            self.execution_order.insert(first_downstream_position, node_name)
+        else:
+            self.execution_order = list(nx.topological_sort(self.graph))
 
     """
-        Dry run the workload to collect statistics on estimated table sizes and time savings.
-        
+        Compute the fingerprints keying the statistics of each node: the fingerprint of its SQL, of its inputs and of
+        its downstream nodes. The input fingerprint covers the SQL of all upstream nodes and the base tables read.
+    """
+    def compute_fingerprints(self) -> dict:
+        sql_fingerprints = {node_name: sql_fingerprint(node.get_sql()) for node_name, node in self.node_dict.items()}
+
+        # Upstream fingerprints are chained in topological order, so a change to any upstream SQL propagates.
+        upstream_fingerprints = {}
+        fingerprints = {}
+        for node_name in nx.topological_sort(self.graph):
+            node = self.node_dict[node_name]
+            input_fingerprint = sql_fingerprint(' '.join(
+                sorted(upstream_fingerprints[name] for name in node.get_input_node_names()) +
+                sorted(node.referenced_table_names.difference(node.get_input_node_names()))))
+            upstream_fingerprints[node_name] = sql_fingerprint(sql_fingerprints[node_name] + ' ' + input_fingerprint)
+
+            downstream_fingerprint = sql_fingerprint(' '.join(
+                sorted(sql_fingerprints[downstream_node.get_node_name()] for downstream_node in node.downstream_nodes)))
+
+            fingerprints[node_name] = (sql_fingerprints[node_name], input_fingerprint, downstream_fingerprint)
+
+        return fingerprints
+
+    """
+        Find the tables to create so that the given nodes can be profiled, i.e. the nodes themselves, the inputs of
+        their downstream nodes, and all of their upstream nodes.
+
+        Args:
+            node_names (set): the names of the nodes to profile.
+    """
+    def tables_to_profile(self, node_names: set) -> set:
+        required_node_names = set(node_names)
+        for node_name in node_names:
+            for downstream_node in self.node_dict[node_name].downstream_nodes:
+                required_node_names.update(downstream_node.get_input_node_names())
+
+        # Close under inputs by walking the execution order backwards
+        for node_name in reversed(self.execution_order):
+            if node_name in required_node_names:
+                required_node_names.update(self.node_dict[node_name].get_input_node_names())
+
+        return required_node_names
+
+    """
+        Profile a node on a pooled cursor; measures its table size and time save, then stores the statistics in the
+        catalog if there is one.
+
         Args:
+            node_name (str): the name of the node to profile.
             runs (int): number of runs to perform to reduce variance.
+            test_suffix (str): the suffix of the test tables created for the measurements.
+            profile_concurrency (int): the number of nodes profiled concurrently.
+            fingerprints (tuple): the fingerprints keying the statistics of the node in the catalog.
+            sample_rate (float): the fraction of rows to sample from base tables, or None to profile on the full data.
+            sampled_table_names (set): the base tables to sample; all base tables if None.
+            overhead (float): the fixed overhead in the time save, which is not extrapolated in sampled mode.
     """
-    def dry_run(self, runs=1):
-        if self.debug:
-            print("Dry running. Creating tables..........................")
-        # Create all tables
+    def profile_node(self, node_name: str, runs: int, test_suffix: str, profile_concurrency: int, fingerprints=None,
+                     sample_rate=None, sampled_table_names=None, overhead=0):
+        node = self.node_dict[node_name]
+        with self.cursor_pool.cursor() as cursor:
+            node.compute_table_size(cursor, sample_rate)
+            node.compute_time_save(cursor, self.inmemory_prefix, runs=runs, test_suffix=test_suffix,
+                                   sample_rate=sample_rate, sampled_table_names=sampled_table_names,
+                                   overhead=overhead)
+        node.profile_concurrency = profile_concurrency
+
+        if self.statistics_catalog is not None:
+            self.statistics_catalog.store(fingerprints, node)
+
+    """
+        Find the nodes whose table size & time save scale linearly with the sample rate in sampled profiling, i.e.
+        which read exactly one sampled relation, either a sampled base table or an input which itself scales, and do
+        not aggregate (see ExecutionNode.is_aggregate). Each of their rows then derives from a single sampled row.
+
+        Args:
+            sampled_table_names (set): the base tables sampled; all base tables if None.
+    """
+    def sample_scaled_node_names(self, sampled_table_names=None) -> set:
+        reads_sample = {}
+        scaled_node_names = set()
         for node_name in self.execution_order:
-            self.node_dict[node_name].create_table(self.cursor_main)
+            node = self.node_dict[node_name]
+            sampled_base_table_names = node.get_base_table_names()
+            if sampled_table_names is not None:
+                sampled_base_table_names = sampled_base_table_names.intersection(sampled_table_names)
+            sampled_input_names = [name for name in node.get_input_node_names() if reads_sample[name]]
+
+            reads_sample[node_name] = len(sampled_base_table_names) + len(sampled_input_names) > 0
+            if len(sampled_base_table_names) + len(sampled_input_names) == 1 and \
+                    all(name in scaled_node_names for name in sampled_input_names) and not node.is_aggregate():
+                scaled_node_names.add(node_name)
+
+        return scaled_node_names
+
+    """
+        Measure the fixed overhead in time saves, i.e. the time of writing an empty table to disk less the time of
+        writing it to memory.
+
+        Args:
+            cursor: a cursor of the backend.
+            runs (int): number of runs to average over.
+    """
+    def measure_write_overhead(self, cursor, runs=1) -> float:
+        table_name = "write_overhead_test"
+        sql = "CREATE TABLE " + table_name + " with (format = 'PARQUET') AS (SELECT 1 AS x WHERE 1 = 0)"
+
+        overhead = 0
+        for _ in range(runs):
+            self.backend.execute(cursor, sql)
+            overhead += self.backend.stats(cursor)["elapsed_time"]
+            self.backend.execute(cursor, self.backend.inmemory_sql(
+                sql.replace(' ' + table_name + ' ', ' ' + self.inmemory_prefix + table_name + ' ')))
+            overhead -= self.backend.stats(cursor)["elapsed_time"]
+
+            self.backend.drop(cursor, table_name)
+            self.backend.drop(cursor, self.inmemory_prefix + table_name)
+
+        return overhead / runs
+
+    """
+        Dry run the workload to collect statistics on estimated table sizes and time savings. If the graph has a
+        statistics catalog, only nodes without fresh statistics in it are profiled, and their new statistics are
+        stored back. Sampled statistics are only reused by dry runs at the same sample rate.
+
+        Nodes can be profiled concurrently on multiple pooled cursors, each with its own test tables. The number of
+        concurrent measurements is capped so that contention does not distort the timings, and the cap is recorded
+        with the statistics of each node.
+
+        In sampled mode, tables are created from and profiled on samples of the base tables, so that profiling cost
+        scales with the sample rate instead of the data size. The statistics of nodes which scale with the sample
+        (see sample_scaled_node_names) are extrapolated by the sample rate; those of other nodes, e.g. aggregates, are
+        used as measured.
+        
+        Args:
+            runs (int): number of runs to perform to reduce variance.
+            num_workers (int): maximum number of nodes profiled concurrently.
+            sample_rate (float): the fraction of rows to sample from base tables, or None to profile on the full data.
+            sampled_table_names (set): the base tables to sample, typically the fact tables; all base tables if None.
+            factorized (bool): whether to measure time saves with a factorized plan, running each downstream table
+                once per configuration of its inputs instead of twice per input (see TimeSaveProfiler). Factorized
+                measurements share test tables, so they are made serially regardless of num_workers.
+    """
+    def dry_run(self, runs=1, num_workers=1, sample_rate=None, sampled_table_names=None, factorized=False):
+        if num_workers > self.cursor_pool.max_connections:
+            raise ValueError("Profiling with " + str(num_workers) + " workers requires a pool of at least " +
+                             str(num_workers) + " connections")
+
+        # Reuse fresh statistics from the catalog
+        fingerprints = None
+        node_names_to_profile = set(self.execution_order)
+        if self.statistics_catalog is not None:
+            fingerprints = self.compute_fingerprints()
+            for node_name in self.execution_order:
+                statistics = self.statistics_catalog.lookup(fingerprints[node_name], sample_rate)
+                if statistics is not None:
+                    node = self.node_dict[node_name]
+                    node.table_size = statistics["table_size"]
+                    node.time_save = statistics["time_save"]
+                    node.time_save_history = statistics["time_save_history"]
+                    node.profile_concurrency = statistics["profile_concurrency"]
+                    node.sample_rate = statistics["sample_rate"]
+                    node.execution_statistics = statistics["execution_statistics"]
+                    node_names_to_profile.remove(node_name)
+
+            if self.debug:
+                print("Fresh statistics found for " + str(len(self.execution_order) - len(node_names_to_profile)) +
+                      " of " + str(len(self.execution_order)) + " nodes")
+
+        if len(node_names_to_profile) == 0:
+            if self.debug:
+                print("Dry run complete.")
+            return
+
+        node_names_to_create = self.tables_to_profile(node_names_to_profile)
+
+        with self.cursor_pool.cursor() as cursor:
+            if self.debug:
+                print("Dry running. Creating tables..........................")
+            # Create all tables required for profiling
+            for node_name in self.execution_order:
+                if node_name in node_names_to_create:
+                    self.node_dict[node_name].create_table(cursor, sample_rate=sample_rate,
+                                                           sampled_table_names=sampled_table_names)
 
         if self.debug:
             print("Collecting statistics..........................")
 
-        # Collect statistics
-        for node_name in self.execution_order:
-            self.node_dict[node_name].compute_table_size(self.cursor_main)
-            self.node_dict[node_name].compute_time_save(self.cursor_main, self.inmemory_prefix, runs=runs)
+        # Only extrapolate sampled statistics of nodes scaling with the sample, and only the data-dependent part of
+        # their time saves.
+        overhead = 0
+        if sample_rate is not None:
+            scaled_node_names = self.sample_scaled_node_names(sampled_table_names)
+            for node_name in node_names_to_profile:
+                self.node_dict[node_name].scales_with_sample = node_name in scaled_node_names
 
-        if self.debug:
-            print("Cleaning up tables..........................")
+            with self.cursor_pool.cursor() as cursor:
+                overhead = self.measure_write_overhead(cursor, runs)
 
-        # Cleanup tables
-        for node_name in self.execution_order:
-            self.node_dict[node_name].drop_table(self.cursor_main)
-            self.node_dict[node_name].drop_table(self.cursor_main, self.inmemory_prefix, on_disk=False)
+            if self.debug:
+                print("Extrapolating the statistics of " + str(len(scaled_node_names & node_names_to_profile)) +
+                      " of " + str(len(node_names_to_profile)) + " nodes; write overhead " + str(overhead))
+
+        if factorized:
+            with self.cursor_pool.cursor() as cursor:
+                for node_name in self.execution_order:
+                    if node_name in node_names_to_profile:
+                        self.node_dict[node_name].compute_table_size(cursor, sample_rate)
+
+                profiler = TimeSaveProfiler(self.node_dict, self.execution_order, self.inmemory_prefix, self.backend,
+                                            debug=self.debug)
+                profiler.profile(cursor, node_names_to_profile, runs=runs, sample_rate=sample_rate,
+                                 sampled_table_names=sampled_table_names, overhead=overhead)
+
+            for node_name in node_names_to_profile:
+                self.node_dict[node_name].profile_concurrency = 1
+                if self.statistics_catalog is not None:
+                    self.statistics_catalog.store(fingerprints[node_name], self.node_dict[node_name])
+        else:
+            # Collect statistics; concurrently profiled nodes use test tables suffixed by their position in the order.
+            with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="profiler") as executor:
+                futures = []
+                for i, node_name in enumerate(self.execution_order):
+                    if node_name in node_names_to_profile:
+                        test_suffix = '_test' if num_workers == 1 else '_test' + str(i)
+                        futures.append(executor.submit(self.profile_node, node_name, runs, test_suffix, num_workers,
+                                                       None if fingerprints is None else fingerprints[node_name],
+                                                       sample_rate, sampled_table_names, overhead))
+
+                for future in futures:
+                    future.result()
+
+        with self.cursor_pool.cursor() as cursor:
+            if self.debug:
+                print("Cleaning up tables..........................")
+
+            # Cleanup tables
+            for node_name in self.execution_order:
+                if node_name in node_names_to_create:
+                    self.node_dict[node_name].drop_table(cursor)
+                    self.node_dict[node_name].drop_table(cursor, self.inmemory_prefix, on_disk=False)
 
         if self.debug:
             print("Dry run complete.")
@@ -136,94 +459,485 @@ class ExecutionGraph(object):
     def optimize(self, optimizer: Optimizer):
         optimizer.add_graph(self)
         optimizer.optimize()
+        self.memory_limit = optimizer.memory_limit
 
 
     """
-        Separate materialization thread for parallel materialization of in-memory tables.
+        Callback of a node's materialization future; lets the garbage collector drop the node once it is safely on
+        disk, or wakes the scheduler up with the error if the write failed.
+    """
+    def materialization_done(self, node, future):
+        if future.exception() is None:
+            self.garbage_collector.mark_materialized(node)
+        else:
+            self.completion_queue.put((None, future.exception()))
+
     """
-    def materialization_func(self):
-        for node in iter(self.materialization_queue.get, None):
-            node.materialize_table(self.cursor_materialization, self.inmemory_prefix)
+        Worker thread of the executor; creates the nodes dispatched by the scheduler on its own cursor and reports
+        each completion back to the scheduler.
 
-        # Block & wait for materialization to finish
-        while True:
+        Args:
+            cursor: the cursor of the backend owned by this worker.
+    """
+    def worker_func(self, cursor):
+        for node, on_disk, inmemory_input_names, estimated_table_size, admitted_table_size in \
+                iter(self.task_queue.get, None):
             try:
-                self.cursor_materialization.fetchall()
-            except:
-                break
+                with trace_span(self.tracer, "create_table", node.get_node_name(), on_disk=on_disk):
+                    node.create_table(cursor, self.inmemory_prefix, inmemory_input_names, on_disk)
+                stats = self.backend.stats(cursor)
+                record = {"elapsed_time": stats["elapsed_time"],
+                          "processed_bytes": stats["processed_bytes"],
+                          "on_disk": on_disk,
+                          "inmemory_input_names": inmemory_input_names.intersection(node.get_input_node_names()),
+                          "estimated_table_size": estimated_table_size,
+                          "admitted_table_size": admitted_table_size,
+                          "inmemory_table_size": None}
+
+                # Measure the actual size of in-memory tables for the memory ledger
+                if not on_disk:
+                    node.compute_inmemory_table_size(cursor, self.inmemory_prefix)
+                    record["inmemory_table_size"] = node.get_inmemory_table_size()
+
+                self.execution_records[node.get_node_name()] = record
+
+                self.completion_queue.put((node.get_node_name(), None))
+            except Exception as e:
+                self.completion_queue.put((node.get_node_name(), e))
 
     """
-            Separate materialization thread for parallel materialization of in-memory tables.
-        """
+        The expected in-memory size of a node; its actual size when it was last created in memory if known, and the
+        estimated table size otherwise.
+    """
+    @staticmethod
+    def expected_table_size(node) -> int:
+        if node.get_inmemory_table_size() is not None:
+            return node.get_inmemory_table_size()
+        return node.get_table_size()
 
-    def gc_func(self):
-        for node in iter(self.gc_queue.get, None):
-            node.drop_table(self.cursor_gc, self.inmemory_prefix, on_disk=False, block=False)
+    """
+        Check whether a node can be admitted into memory given the bytes resident in the in-memory catalog.
 
-        # Block & wait for garbage collection to finish
-        while True:
-            try:
-                self.cursor_gc.fetchall()
-            except:
+        Args:
+            node (ExecutionNode): the flagged node to admit.
+    """
+    def fits_in_memory(self, node) -> bool:
+        return (self.memory_limit is None or
+                self.memory_ledger.get_resident_bytes() + self.expected_table_size(node) <= self.memory_limit)
+
+    """
+        Pick resident tables to evict so that a flagged node fits in memory, in increasing order of time save per
+        byte. Inputs of the node are never evicted, and eviction is only worthwhile if the evicted tables save less
+        time than the node does.
+
+        Args:
+            node (ExecutionNode): the flagged node to admit.
+
+        Returns:
+            victim_names: the names of the tables to evict, or None if eviction cannot make room for the node.
+    """
+    def find_eviction_victims(self, node):
+        bytes_to_free = self.memory_ledger.get_resident_bytes() + self.expected_table_size(node) - self.memory_limit
+
+        victim_names = []
+        bytes_freed = 0
+        victims_time_save = 0
+        for name in self.eviction_candidates(node.get_input_node_names()):
+            if bytes_freed >= bytes_to_free:
                 break
+            victim_names.append(name)
+            bytes_freed += self.memory_ledger.get_size(name)
+            victims_time_save += self.node_dict[name].get_time_save()
+
+        if bytes_freed < bytes_to_free or victims_time_save >= node.get_time_save():
+            return None
+
+        return victim_names
 
     """
-        Run the workload and refresh the MVs.
+        The resident tables which may be evicted, in increasing order of time save per byte.
+
+        Args:
+            protected_names (set): the names of the tables which must stay in memory.
     """
-    def execute(self):
+    def eviction_candidates(self, protected_names) -> list:
+        candidate_names = [name for name in self.inmemory_node_names
+                           if self.memory_ledger.is_resident(name) and name not in protected_names]
+        candidate_names.sort(key=lambda name: self.node_dict[name].get_time_save() /
+                             max(self.memory_ledger.get_size(name), 1))
+        return candidate_names
+
+    """
+        Bring the bytes resident in the in-memory catalog back within the memory limit after a table came out larger
+        than estimated, by evicting the resident tables saving the least time per byte, possibly including the
+        oversized table itself. Running nodes and their inputs are never evicted.
+
+        Args:
+            node_name (str): the name of the table which was just measured.
+            running (set): the names of the nodes being created.
+    """
+    def restore_memory_limit(self, node_name, running):
+        bytes_to_free = self.memory_ledger.get_resident_bytes() - self.memory_limit
+        if bytes_to_free <= 0:
+            return
+
         if self.debug:
-            print("Starting workload execution.........................")
+            print("Node " + node_name + " is larger than estimated, memory limit exceeded by " + str(bytes_to_free) +
+                  " bytes")
 
-        execution_start_time = time.time()
+        protected_names = set(running)
+        for running_node_name in running:
+            protected_names.update(self.node_dict[running_node_name].get_input_node_names())
 
-        # Start multithreaded table materializer
-        self.materialization_thread = threading.Thread(target=self.materialization_func)
-        self.materialization_thread.start()
+        victim_names = []
+        bytes_freed = 0
+        for name in self.eviction_candidates(protected_names):
+            if bytes_freed >= bytes_to_free:
+                break
+            victim_names.append(name)
+            bytes_freed += self.memory_ledger.get_size(name)
 
-        # Start multithreaded table garbage collector
-        self.gc_thread = threading.Thread(target=self.gc_func)
-        self.gc_thread.start()
+        if self.debug and bytes_freed < bytes_to_free:
+            print("Only " + str(bytes_freed) + " bytes can be evicted; the memory limit stays exceeded until running "
+                  "nodes complete")
 
-        # Maintain a list of successors yet to be computed for each node; garbage collect an in-memory table
-        # When all of its downstream tables are computed.
-        num_successors_dict = {node_name: len(node.downstream_nodes) for node_name, node in self.node_dict.items()}
+        self.evict(victim_names)
 
-        # Run nodes in given execution order
-        for node_name in self.execution_order:
-            node = self.node_dict[node_name]
+    """
+        Evict resident tables from memory. Each table is materialized before its remaining downstream tables are
+        switched to reading it from disk, and it is then dropped by the garbage collector.
+
+        Args:
+            victim_names (List[str]): the names of the tables to evict.
+    """
+    def evict(self, victim_names):
+        for name in victim_names:
+            if self.debug:
+                print("Evicting node " + name + " from memory")
 
-            # Execute current node; create table in memory if node is flagged, create on disk otherwise.
-            node.create_table(self.cursor_main, self.inmemory_prefix, self.flagged_node_names,
-                              node_name not in self.flagged_node_names)
+            try:
+                with trace_span(self.tracer, "evict", name):
+                    self.materialization_pool.wait(name)
+            except Exception as e:
+                self.completion_queue.put((None, e))
+                return
+
+            self.inmemory_node_names.remove(name)
+            self.garbage_collector.evict(self.node_dict[name])
+
+    """
+        Run the workload and refresh the MVs.
 
-            # Concurrent materialization of in-memory table
-            if node_name in self.flagged_node_names:
-                self.materialization_queue.put(node)
+        Every node whose inputs have all been computed is dispatched to a free worker, in the priority given by the
+        execution order. A flagged node is only admitted into memory if the bytes resident in the in-memory catalog
+        stay within the memory limit; otherwise it is deferred until running nodes or pending garbage collection free
+        memory. When nothing is left to wait for, resident tables saving less time are evicted to make room for it,
+        or the node is demoted to disk. The ledger tracks the actual size of each in-memory table once it is created,
+        and if a table comes out larger than estimated, resident tables are evicted to get back within the limit.
 
-            # Concurrent garbage collection of in-memory table
-            num_successors_dict[node_name] -= 1
-            if num_successors_dict[node_name] == 0 and node_name in self.flagged_node_names:
-                self.gc_queue.put(node)
+        Under a stable plan each node is created in the same configuration every time, so the differences making up
+        its observed time save (see refine_statistics) are never observed. With exploration, nodes without an observed
+        time save are occasionally created in the other location: flagged nodes on disk, and other nodes in memory if
+        they fit without waiting or evicting.
 
+        Args:
+            num_workers (int): number of workers creating tables concurrently, each on its own pooled cursor. A
+                single worker executes the nodes one at a time in the execution order.
+            num_materialization_workers (int): number of in-memory tables written to disk concurrently.
+            max_inflight_materializations (int): maximum number of writes in flight; scheduling blocks beyond it
+                until a write completes. Unbounded if None.
+            statistics_decay (float): if given, the weight of the measurements of this execution when refining the
+                statistics of the nodes (see refine_statistics). Statistics are left unchanged if None.
+            exploration_rate (float): the probability of creating a node without an observed time save in the other
+                location. No exploration if 0.
+            tracer (Tracer): records a span for every table created, materialized and dropped during the execution,
+                labeled by thread and node. Nothing is traced if None.
+
+        The pool must allow a connection for each worker and materialization worker, plus one for garbage collection.
+    """
+    def execute(self, num_workers=1, num_materialization_workers=1, max_inflight_materializations=None,
+                statistics_decay=None, tracer: Tracer = None, exploration_rate=0):
         if self.debug:
-            print("waiting for materialization thread to finish. Time elapsed:", time.time() - execution_start_time)
+            print("Starting workload execution.........................")
+
+        num_connections = num_workers + num_materialization_workers + 1
+        if num_connections > self.cursor_pool.max_connections:
+            raise ValueError("Executing with " + str(num_workers) + " workers and " +
+                             str(num_materialization_workers) + " materialization workers requires a pool of at least "
+                             + str(num_connections) + " connections")
+
+        self.execution_records = {}
+        self.tracer = tracer
+        self.measured_memory_profile = []
+
+        execution_start_time = time.time()
+
+        # Everything started from here on is stopped & the worker cursors are returned to the pool even if the
+        # scheduler fails, so that the bounded pool does not leak connections.
+        self.materialization_pool = None
+        self.garbage_collector = None
+        worker_cursors = []
+        worker_threads = []
+        error = None
+        try:
+            for _ in range(num_workers):
+                worker_cursors.append(self.cursor_pool.acquire())
+
+            # Start multithreaded table materializers
+            self.materialization_pool = MaterializationPool(self.cursor_pool, self.inmemory_prefix,
+                                                            num_materialization_workers, max_inflight_materializations,
+                                                            self.debug, tracer)
+            self.materialization_pool.start()
+
+            # Start multithreaded table garbage collector
+            self.memory_ledger = MemoryLedger()
+            self.garbage_collector = GarbageCollector(self.cursor_pool, self.inmemory_prefix, self.memory_ledger,
+                                                      lambda node_name: self.completion_queue.put((None, None)),
+                                                      self.debug, tracer)
+            self.garbage_collector.start()
+
+            # Start the workers creating tables; the scheduler is also woken up on the completion queue whenever the
+            # garbage collector frees memory.
+            self.task_queue = queue.Queue()
+            self.completion_queue = queue.Queue()
+            for i, cursor in enumerate(worker_cursors):
+                worker_thread = threading.Thread(target=self.worker_func, args=(cursor,), name="worker-" + str(i))
+                worker_thread.start()
+                worker_threads.append(worker_thread)
+
+            # Maintain a count of inputs yet to be computed for each node; a node is ready once all of its inputs are.
+            num_predecessors_dict = {node_name: len(node.get_input_node_names())
+                                     for node_name, node in self.node_dict.items()}
+
+            # Maintain a count of successors yet to be computed for each node; garbage collect an in-memory table
+            # When all of its downstream tables are computed.
+            num_successors_dict = {node_name: len(node.downstream_nodes) for node_name, node in self.node_dict.items()}
+
+            # Ready nodes are dispatched by their position in the execution order.
+            order_position = {node_name: i for i, node_name in enumerate(self.execution_order)}
+            ready = [(order_position[node_name], node_name) for node_name, num_predecessors
+                     in num_predecessors_dict.items() if num_predecessors == 0]
+            heapq.heapify(ready)
+
+            running = set()
+            self.inmemory_node_names = set()
+
+            while ready or running:
+                # Dispatch ready nodes while there are free workers
+                deferred = []
+                while ready and len(running) < len(worker_threads):
+                    position, node_name = heapq.heappop(ready)
+                    node = self.node_dict[node_name]
+
+                    in_memory = node_name in self.flagged_node_names
+
+                    # Explore the other location of nodes whose time save has not been observed
+                    if exploration_rate > 0 and node.get_observed_time_save() is None and \
+                            random.random() < exploration_rate:
+                        in_memory = not in_memory and self.fits_in_memory(node)
+                        if self.debug:
+                            print("Exploring node " + node_name + (" in memory" if in_memory else " on disk"))
+
+                    if in_memory and not self.fits_in_memory(node):
+                        # Wait for running nodes or pending drops to free memory if possible
+                        if running or self.garbage_collector.num_pending() > 0:
+                            deferred.append((position, node_name))
+                            continue
+
+                        # Evict resident tables and wait for them to be dropped if it pays off
+                        victim_names = self.find_eviction_victims(node)
+                        if victim_names is not None:
+                            self.evict(victim_names)
+                            deferred.append((position, node_name))
+                            continue
+
+                        # Demote the node to disk otherwise
+                        if self.debug:
+                            print("Memory limit reached, creating node " + node_name + " on disk")
+                        in_memory = False
+
+                    if in_memory:
+                        self.memory_ledger.add(node_name, self.expected_table_size(node))
+                        self.inmemory_node_names.add(node_name)
+
+                    running.add(node_name)
+                    self.task_queue.put((node, not in_memory, set(self.inmemory_node_names), node.get_table_size(),
+                                         self.expected_table_size(node)))
+
+                for item in deferred:
+                    heapq.heappush(ready, item)
+
+                # Wait for a node to finish or for memory to be freed
+                node_name, exception = self.completion_queue.get()
+                if exception is not None:
+                    error = exception
+                    break
+                if node_name is None:
+                    continue
+
+                running.remove(node_name)
+                node = self.node_dict[node_name]
+
+                # Concurrent materialization of in-memory table
+                if node_name in self.inmemory_node_names:
+                    self.memory_ledger.resize(node_name, node.get_inmemory_table_size())
+
+                    future = self.materialization_pool.submit(node)
+                    future.add_done_callback(lambda f, node=node: self.materialization_done(node, f))
+
+                    # An in-memory table without downstream tables is only kept until it is materialized
+                    if len(node.downstream_nodes) == 0:
+                        self.garbage_collector.mark_consumers_done(node)
+
+                    # Evict tables if the node came out larger than estimated
+                    if self.memory_limit is not None:
+                        self.restore_memory_limit(node_name, running)
+
+                self.measured_memory_profile.append((node_name, self.memory_ledger.get_resident_bytes()))
+
+                # Downstream nodes become ready once all of their inputs are computed
+                for downstream_node in node.downstream_nodes:
+                    downstream_node_name = downstream_node.get_node_name()
+                    num_predecessors_dict[downstream_node_name] -= 1
+                    if num_predecessors_dict[downstream_node_name] == 0:
+                        heapq.heappush(ready, (order_position[downstream_node_name], downstream_node_name))
+
+                # Concurrent garbage collection of in-memory inputs with no downstream tables left to compute
+                for input_node_name in node.get_input_node_names():
+                    num_successors_dict[input_node_name] -= 1
+                    if num_successors_dict[input_node_name] == 0 and input_node_name in self.inmemory_node_names:
+                        self.garbage_collector.mark_consumers_done(self.node_dict[input_node_name])
+        finally:
+            # Join workers; nodes still running when an error occurred are left to finish.
+            for _ in worker_threads:
+                self.task_queue.put(None)
+            for worker_thread in worker_threads:
+                worker_thread.join()
+
+            if self.debug:
+                print("waiting for materialization workers to finish. Time elapsed:",
+                      time.time() - execution_start_time)
+
+            # Join multithreaded writers
+            if self.materialization_pool is not None:
+                try:
+                    self.materialization_pool.join()
+                except Exception as e:
+                    error = e if error is None else error
 
-        # Join multithreaded writer
-        self.materialization_queue.put(None)
-        self.materialization_thread.join()
+            # Join multithreaded garbage collector
+            if self.garbage_collector is not None:
+                self.garbage_collector.join()
 
-        # Join multithreaded garbage collector
-        self.gc_queue.put(None)
-        self.gc_thread.join()
+            # Return the cursors to the pool
+            for cursor in worker_cursors:
+                self.cursor_pool.release(cursor)
+
+        if error is not None:
+            raise error
 
         # Compute execution time breakdown
         execution_end_time = time.time()
 
         if self.debug:
             print("total execution time:", execution_end_time - execution_start_time)
+            print("peak memory usage:", self.memory_ledger.get_peak_bytes())
+
+        if statistics_decay is not None:
+            self.refine_statistics(statistics_decay)
 
         return execution_end_time - execution_start_time
 
+    """
+        Refine the statistics of the nodes with the measurements of the last execution, so that the optimizer
+        improves with every refresh without a dedicated dry run.
+
+        The time of creating each node is blended into an exponential moving average per configuration, i.e. whether
+        the node was created on disk and which of its inputs were read from memory. Each difference making up the
+        time save of a node is only taken between configurations differing in that factor alone; once all of them
+        have been observed, the observed time save is blended into the time save of the node, which is otherwise left
+        unchanged; see the exploration of `execute` for observing them under a stable plan. Refined statistics are
+        stored in the statistics catalog if there is one.
+
+        Table sizes are not refined: the measured in-memory size is a different quantity than the estimated table size
+        the optimizer plans with, and it is kept per node for admission instead (see expected_table_size).
+
+        Args:
+            decay (float): the weight of the new measurements, between 0 and 1.
+    """
+    def refine_statistics(self, decay: float):
+        for node_name, record in self.execution_records.items():
+            node = self.node_dict[node_name]
+            node.update_execution_statistic(node.configuration_key(record["on_disk"], record["inmemory_input_names"]),
+                                            record["elapsed_time"], decay)
+
+        for node_name in self.execution_records:
+            node = self.node_dict[node_name]
+            observed_time_save = node.get_observed_time_save()
+            if observed_time_save is not None:
+                node.time_save = max((1 - decay) * node.get_time_save() + decay * observed_time_save, 0)
+
+            if self.debug:
+                print("Refined time save of " + node_name + ": " + str(node.get_time_save()))
+
+        if self.statistics_catalog is not None:
+            fingerprints = self.compute_fingerprints()
+            for node_name in self.execution_records:
+                self.statistics_catalog.store(fingerprints[node_name], self.node_dict[node_name])
+
+    """
+        The memory profile predicted for the current plan, i.e. the bytes resident in memory at each step of the
+        execution order given the estimated table sizes and the flagged nodes.
+    """
+    def predicted_memory_profile(self) -> list:
+        node_sizes = {node_name: node.get_table_size() for node_name, node in self.node_dict.items()}
+        flagged_node_names = self.flagged_node_names if self.flagged_node_names is not None else set()
+        return compute_memory_profile(self.graph, self.execution_order, node_sizes, flagged_node_names)
+
+    """
+        The error of the estimated size of each table created in memory during the last execution, compared to its
+        size measured in the in-memory catalog. The estimate is the one the predicted memory profile is built from,
+        as it was when the table was scheduled.
+
+        Returns:
+            errors: a mapping from node name to its estimated, admitted (see expected_table_size) and measured size in
+                bytes, the error (measured minus estimated) and the error relative to the measured size.
+    """
+    def size_estimation_errors(self) -> dict:
+        errors = {}
+        for node_name, record in self.execution_records.items():
+            if record["inmemory_table_size"] is None:
+                continue
+
+            error = record["inmemory_table_size"] - record["estimated_table_size"]
+            errors[node_name] = {"estimated": record["estimated_table_size"],
+                                 "admitted": record["admitted_table_size"],
+                                 "measured": record["inmemory_table_size"],
+                                 "error": error,
+                                 "relative_error": error / max(record["inmemory_table_size"], 1)}
+
+        return errors
+
+    """
+        Compare the predicted memory profile of the current plan with the profile measured during the last
+        execution, step by step of the execution order.
+
+        Returns:
+            report: a dict of the steps of the execution order, the predicted and measured resident bytes at each
+                step (None for nodes not executed), their peaks, and the size estimation errors.
+    """
+    def memory_profile_report(self) -> dict:
+        predicted = self.predicted_memory_profile()
+        measured_by_node = dict(self.measured_memory_profile)
+        measured = [measured_by_node.get(node_name) for node_name in self.execution_order]
+
+        return {"steps": list(self.execution_order),
+                "predicted": predicted,
+                "measured": measured,
+                "predicted_peak": max(predicted, default=0),
+                "measured_peak": self.memory_ledger.get_peak_bytes(),
+                "size_errors": self.size_estimation_errors()}
+
     """
        Drop all tables in the workload.
     """
@@ -231,6 +945,7 @@ class ExecutionGraph(object):
         if self.debug:
             print("Cleaning up tables.................................")
 
-        for node_name in self.execution_order:
-            self.node_dict[node_name].drop_table(self.cursor_main)
-            self.node_dict[node_name].drop_table(self.cursor_main, inmemory_prefix = self.inmemory_prefix, on_disk=False)
+        with self.cursor_pool.cursor() as cursor:
+            for node_name in self.execution_order:
+                self.node_dict[node_name].drop_table(cursor)
+                self.node_dict[node_name].drop_table(cursor, inmemory_prefix = self.inmemory_prefix, on_disk=False)
@@ -3,7 +3,30 @@
 #
 # Copyright 2021-2022 University of Illinois
 from sql_metadata import Parser
-from prestodb.dbapi import Cursor
+import math
+import re
+
+from core.backend.backend import Backend
+from core.backend.presto import PrestoBackend
+
+# z-score of the confidence intervals reported for sampled estimates.
+CONFIDENCE_Z = 1.96
+
+# Tokens of SQL statements: string literals, quoted & (qualified) identifiers, whitespace, and single characters.
+SQL_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|[A-Za-z_][\w.$]*|\s+|.", re.DOTALL)
+
+# Keywords ending the FROM list of a query.
+FROM_LIST_END_KEYWORDS = {'SELECT', 'WHERE', 'GROUP', 'HAVING', 'ORDER', 'LIMIT', 'OFFSET', 'FETCH', 'UNION',
+                          'INTERSECT', 'EXCEPT', 'WINDOW', 'QUALIFY', ';'}
+
+# Aggregate functions, which reduce the number of rows unless used as window functions.
+AGGREGATE_FUNCTIONS = {'COUNT', 'SUM', 'AVG', 'MIN', 'MAX', 'STDDEV', 'STDDEV_SAMP', 'STDDEV_POP', 'VARIANCE',
+                       'VAR_SAMP', 'VAR_POP', 'APPROX_DISTINCT', 'APPROX_PERCENTILE', 'ARBITRARY', 'ANY_VALUE',
+                       'ARRAY_AGG', 'STRING_AGG', 'LISTAGG', 'BOOL_AND', 'BOOL_OR', 'EVERY'}
+
+# Keywords which may follow a table reference without an alias.
+TABLE_REFERENCE_END_KEYWORDS = FROM_LIST_END_KEYWORDS | {'JOIN', 'INNER', 'LEFT', 'RIGHT', 'FULL', 'OUTER', 'CROSS',
+                                                         'NATURAL', 'ON', 'USING', 'TABLESAMPLE'}
 
 
 class ExecutionNode(object):
@@ -14,14 +37,21 @@ class ExecutionNode(object):
     Args:
         sql (str): The DDL for creating the table/MV.
         debug (bool): whether to print debug message during execution.
+        parse_cache (ParseCache): cache of parsed statements to look the tables of the DDL up in. The DDL is parsed
+            directly if None.
+        backend (Backend): the backend executing the statements of this node; Presto if None.
     """
-    def __init__(self, sql: str, debug=False):
+    def __init__(self, sql: str, debug=False, parse_cache=None, backend: Backend = None):
         self.sql = sql
+        self.backend = backend if backend is not None else PrestoBackend()
 
         # Parse table name and input tables names (dependencies).
-        tokens = Parser(sql).tables
+        tokens = Parser(sql).tables if parse_cache is None else parse_cache.parse(sql)
         self.node_name = tokens[0]
-        self.input_node_names = set(tokens[1:])
+        self.referenced_table_names = set(tokens[1:])
+
+        # Input tables which are nodes of the execution graph; base tables are removed when building the graph.
+        self.input_node_names = set(self.referenced_table_names)
 
         self.debug = debug
 
@@ -31,10 +61,30 @@ class ExecutionNode(object):
         # Estimated size of the table in bytes.
         self.table_size = 0
 
+        # Actual size of the table in bytes, measured after it was last created in memory.
+        self.inmemory_table_size = None
+
         # Estimated time saving for workload by keeping this table in memory.
         self.time_save_history = 0
         self.time_save = 0
 
+        # Number of nodes profiled concurrently when the statistics of this node were measured.
+        self.profile_concurrency = None
+
+        # Sampling rate of the base tables when the statistics of this node were estimated; None if measured on the
+        # full data. Sampled estimates come with the half-width of their 95% confidence intervals, if known.
+        self.sample_rate = None
+        self.table_size_error = None
+        self.time_save_error = None
+
+        # Whether the size & time save of this table scale linearly with the sample rate, so that sampled estimates
+        # are extrapolated by it; otherwise they are used as measured (see ExecutionGraph.sample_scaled_node_names).
+        self.scales_with_sample = True
+
+        # Exponential moving averages of the times (seconds) of creating this table measured in production executions,
+        # keyed by the configuration they were measured in (see configuration_key).
+        self.execution_statistics = {}
+
     def get_sql(self) -> str:
         return self.sql
 
@@ -48,16 +98,127 @@ class ExecutionNode(object):
         self.downstream_nodes.add(node)
 
     """
-        Estimate the table size by sending an ANALYZE query to presto. This is a slight overestimation (< 105%) of
-        the actual table size.
+        The base tables read by this node, i.e. the referenced tables which are not nodes of the execution graph.
+    """
+    def get_base_table_names(self) -> set:
+        return self.referenced_table_names.difference(self.input_node_names)
+
+    """
+        Check whether the statement of this node may return fewer rows than it reads in a way that does not scale with
+        its input, i.e. whether it aggregates (GROUP BY or aggregate functions outside of windows), deduplicates
+        (DISTINCT, UNION, INTERSECT, EXCEPT) or limits its rows.
+    """
+    def is_aggregate(self) -> bool:
+        tokens = [token.upper() for token in SQL_TOKEN_PATTERN.findall(self.sql) if not token.isspace()]
+        for i, token in enumerate(tokens):
+            next_token = tokens[i + 1] if i + 1 < len(tokens) else ''
+            if token in ('GROUP', 'DISTINCT', 'INTERSECT', 'EXCEPT', 'LIMIT') or \
+                    (token == 'UNION' and next_token != 'ALL'):
+                return True
+
+            if token in AGGREGATE_FUNCTIONS and next_token == '(':
+                # An aggregate function followed by OVER is a window function
+                depth = 0
+                for j in range(i + 1, len(tokens)):
+                    depth += (tokens[j] == '(') - (tokens[j] == ')')
+                    if depth == 0:
+                        break
+                if j + 1 >= len(tokens) or tokens[j + 1] != 'OVER':
+                    return True
+
+        return False
+
+    """
+        Get the SQL of this node for profiling. If a sample rate is given, the base tables are read through samples.
+
+        Args:
+            sample_rate (float): the fraction of rows to sample from base tables, or None to read them in full.
+            sampled_table_names (set): the base tables to sample; all base tables if None.
+    """
+    def get_profiling_sql(self, sample_rate=None, sampled_table_names=None) -> str:
+        if sample_rate is None:
+            return self.sql
+
+        table_names = self.get_base_table_names()
+        if sampled_table_names is not None:
+            table_names = table_names.intersection(sampled_table_names)
+
+        return self.sample_sql(self.sql, table_names, sample_rate, self.backend.sample_clause)
+
+    """
+        Rewrite a SQL statement to read samples of the given tables. Only table references in FROM lists and after
+        JOIN are rewritten, into a subquery sampling the table. The subquery is aliased by the table name unless the
+        reference has an alias of its own, so that qualified column references stay valid.
+
+        Args:
+            sql (str): the SQL statement to rewrite.
+            table_names (set): the tables to sample.
+            sample_rate (float): the fraction of rows to sample.
+            sample_clause (str): the sampling clause of the engine, with a {percent} placeholder.
+    """
+    @staticmethod
+    def sample_sql(sql: str, table_names: set, sample_rate: float, sample_clause: str) -> str:
+        clause = sample_clause.format(percent=sample_rate * 100)
+        table_names = {table_name.lower() for table_name in table_names}
+        tokens = SQL_TOKEN_PATTERN.findall(sql)
+        words = [token.upper() for token in tokens]
+
+        # Depths of parentheses at which a FROM list is being read, and whether the next token is a table reference.
+        from_list_depths = set()
+        depth = 0
+        expecting_table = False
+        for i, token in enumerate(tokens):
+            if token.isspace():
+                continue
+
+            if token == '(':
+                depth += 1
+                expecting_table = False
+            elif token == ')':
+                from_list_depths.discard(depth)
+                depth -= 1
+            elif words[i] in ('FROM', 'JOIN'):
+                from_list_depths.add(depth)
+                expecting_table = True
+            elif words[i] in FROM_LIST_END_KEYWORDS:
+                from_list_depths.discard(depth)
+                expecting_table = False
+            elif token == ',':
+                expecting_table = depth in from_list_depths
+            elif expecting_table:
+                expecting_table = False
+                if token.lower() in table_names:
+                    next_word = next((word for word in words[i + 1:] if not word.isspace()), '')
+                    has_alias = next_word == 'AS' or (re.match(r'[A-Z_"]', next_word) is not None and
+                                                      next_word not in TABLE_REFERENCE_END_KEYWORDS)
+                    tokens[i] = '(SELECT * FROM ' + token + ' ' + clause + ')' + \
+                        ('' if has_alias else ' AS ' + token.split('.')[-1])
+
+        return ''.join(tokens)
+
+    """
+        Estimate the table size with the backend, e.g. by sending an ANALYZE query to presto.
+
+        If the table was created from sampled base tables and scales with the sample, its size is extrapolated by the
+        sample rate, with a confidence interval derived from the number of sampled rows. Otherwise, e.g. for
+        aggregates whose number of groups does not grow with the sample, the sampled size is used as is, without an
+        interval.
         
         Args:
-            cursor (prestodb.Cursor): a cursor for executing Presto queries.
+            cursor: a cursor of the backend.
+            sample_rate (float): the fraction of base table rows the table was created from, or None if created from
+                the full data.
     """
-    def compute_table_size(self, cursor: Cursor):
-        cursor.execute('ANALYZE ' + self.node_name)
-        cursor.fetchone()
-        self.table_size = int(cursor.stats['processedBytes'])
+    def compute_table_size(self, cursor, sample_rate=None):
+        self.table_size, sampled_rows = self.backend.table_size(cursor, self.node_name)
+        self.table_size_error = None
+
+        # Extrapolate the sampled size; the relative standard error of a Bernoulli sample of n rows is about
+        # sqrt((1 - p) / n).
+        if sample_rate is not None and self.scales_with_sample:
+            self.table_size = int(self.table_size / sample_rate)
+            self.table_size_error = int(CONFIDENCE_Z * self.table_size * math.sqrt((1 - sample_rate) /
+                                                                                   max(sampled_rows, 1)))
 
         if self.debug:
             print("Est. table size of " + self.node_name + ": " + str(self.table_size))
@@ -65,70 +226,119 @@ class ExecutionNode(object):
     def get_table_size(self) -> int:
         return self.table_size
 
+    """
+        Measure the actual size of this table in the in-memory catalog, e.g. from its column statistics. Falls back to
+        the estimated table size if the catalog does not report data sizes.
+
+        Args:
+            cursor: a cursor of the backend.
+            inmemory_prefix (str): the prefix for the schema of the in-memory catalog.
+    """
+    def compute_inmemory_table_size(self, cursor, inmemory_prefix: str):
+        size = self.backend.inmemory_table_size(cursor, inmemory_prefix + self.node_name)
+        self.inmemory_table_size = size if size is not None else self.table_size
+
+        if self.debug:
+            print("In-memory table size of " + self.node_name + ": " + str(self.inmemory_table_size))
+
+    def get_inmemory_table_size(self) -> int:
+        return self.inmemory_table_size
+
     """
         Computes the estimated time save for the workload of keeping this table in memory. Time save is estimated as
         the sum of time saved by (i) each downstream table reading this table from memory instead of from disk and
         (ii) parallel materialization of this table with subsequent operations.
+
+        In sampled mode, all measured statements read samples of their base tables. If the table scales with the
+        sample, the time save less the fixed overhead of writing a table is extrapolated linearly by the sample rate,
+        with a confidence interval derived from the variance over runs; otherwise it is used as measured.
         
         Args:
-            cursor (prestodb.Cursor): a cursor for executing Presto queries.
+            cursor: a cursor of the backend.
             inmemory_prefix (str): the prefix for the schema of the in-memory catalog to keep tables in.
             runs (int): compute the time save as the average of a given number of runs to reduce variance.
+            test_suffix (str): the suffix of the test tables created for the measurements. Nodes profiled concurrently
+                must use distinct suffixes, as they may share downstream tables.
+            sample_rate (float): the fraction of rows to sample from base tables, or None to measure on the full data.
+            sampled_table_names (set): the base tables to sample; all base tables if None.
+            overhead (float): the part of the time save which does not depend on the data, i.e. the difference of the
+                fixed overheads of writing a table to disk and to memory. Only used in sampled mode.
     """
-    def compute_time_save(self, cursor: Cursor, inmemory_prefix: str, runs=1):
+    def compute_time_save(self, cursor, inmemory_prefix: str, runs=1, test_suffix='_test', sample_rate=None,
+                          sampled_table_names=None, overhead=0):
         if self.debug:
             print("Estimating time save for table " + self.node_name + ":---------------------")
 
-        self_test_node_name = self.node_name + '_test'
-        self_inmemory_test_node_name = inmemory_prefix + self.node_name + '_test'
+        self_test_node_name = self.node_name + test_suffix
+        self_inmemory_test_node_name = inmemory_prefix + self.node_name + test_suffix
+
+        sql = self.get_profiling_sql(sample_rate, sampled_table_names)
+        downstream_sqls = {table: table.get_profiling_sql(sample_rate, sampled_table_names)
+                           for table in self.downstream_nodes}
 
         self.time_save_history = []
         for i in range(runs):
             time_save = 0
 
             # Time of creating this table on disk
-            cursor.execute(self.sql.replace(' ' + self.node_name + ' ', ' ' + self_test_node_name + ' '))
-            cursor.fetchall()
-            time_save += int(cursor.stats['elapsedTimeMillis']) / 1000
+            self.backend.execute(cursor, sql.replace(' ' + self.node_name + ' ', ' ' + self_test_node_name + ' '))
+            time_save += self.backend.stats(cursor)["elapsed_time"]
 
             # Time of creating this table in memory
-            cursor.execute(self.sql.replace(' ' + self.node_name + ' ', ' ' + self_inmemory_test_node_name + ' ')
-                           .replace("with (format = \'PARQUET\')", ""))
-            cursor.fetchall()
-            time_save -= int(cursor.stats['elapsedTimeMillis']) / 1000
+            self.backend.execute(cursor, self.backend.inmemory_sql(
+                sql.replace(' ' + self.node_name + ' ', ' ' + self_inmemory_test_node_name + ' ')))
+            time_save -= self.backend.stats(cursor)["elapsed_time"]
 
             for table in self.downstream_nodes:
-                downstream_test_node_name = table.get_node_name() + '_test'
+                downstream_test_node_name = table.get_node_name() + test_suffix
 
                 # Time of constructing downstream table as is
-                cursor.execute(table.get_sql().replace(' ' + table.get_node_name() + ' ', ' ' + downstream_test_node_name + ' ')
-                               .replace(' ' + self.node_name, ' ' + self_test_node_name))
-                cursor.fetchall()
-                time_save += int(cursor.stats['elapsedTimeMillis']) / 1000
+                self.backend.execute(cursor, downstream_sqls[table].replace(' ' + table.get_node_name() + ' ', ' ' + downstream_test_node_name + ' ')
+                                     .replace(' ' + self.node_name, ' ' + self_test_node_name))
+                time_save += self.backend.stats(cursor)["elapsed_time"]
 
                 # Cleanup downstream table
-                cursor.execute("DROP TABLE " + downstream_test_node_name)
-                cursor.fetchone()
+                self.backend.execute(cursor, "DROP TABLE " + downstream_test_node_name)
 
                 # Time of constructing downstream table given current table is in memory
-                cursor.execute(table.get_sql().replace(' ' + table.get_node_name() + ' ', ' ' + downstream_test_node_name + ' ')
-                               .replace(' ' + self.node_name, ' ' + self_inmemory_test_node_name))
-                cursor.fetchall()
-                time_save -= int(cursor.stats['elapsedTimeMillis']) / 1000
+                self.backend.execute(cursor, downstream_sqls[table].replace(' ' + table.get_node_name() + ' ', ' ' + downstream_test_node_name + ' ')
+                                     .replace(' ' + self.node_name, ' ' + self_inmemory_test_node_name))
+                time_save -= self.backend.stats(cursor)["elapsed_time"]
 
                 # Cleanup downstream table
-                cursor.execute("DROP TABLE " + downstream_test_node_name)
-                cursor.fetchone()
+                self.backend.execute(cursor, "DROP TABLE " + downstream_test_node_name)
 
             # Cleanup test tables
-            cursor.execute("DROP TABLE " + self_test_node_name)
-            cursor.fetchone()
-            cursor.execute("DROP TABLE " + self_inmemory_test_node_name)
-            cursor.fetchone()
+            self.backend.execute(cursor, "DROP TABLE " + self_test_node_name)
+            self.backend.execute(cursor, "DROP TABLE " + self_inmemory_test_node_name)
 
             self.time_save_history.append(time_save)
 
-        self.time_save = max(sum(self.time_save_history) / runs, 0)
+        self.set_time_save_history(self.time_save_history, sample_rate, overhead)
+
+    """
+        Set the time save of this table from the time saves measured over a number of runs.
+
+        Args:
+            time_save_history (list): the time save (seconds) measured in each run.
+            sample_rate (float): the fraction of base table rows the measurements read, or None if measured on the
+                full data.
+            overhead (float): the part of the time save which does not scale with the sample rate.
+    """
+    def set_time_save_history(self, time_save_history: list, sample_rate=None, overhead=0):
+        runs = len(time_save_history)
+        self.time_save_history = time_save_history
+        self.time_save = max(sum(time_save_history) / runs, 0)
+        self.time_save_error = None
+
+        # Extrapolate the sampled time save, with a confidence interval from the standard error over runs.
+        if sample_rate is not None and self.scales_with_sample:
+            self.time_save = max(overhead + (sum(time_save_history) / runs - overhead) / sample_rate, 0)
+            if runs > 1:
+                mean = sum(time_save_history) / runs
+                variance = sum((x - mean) ** 2 for x in time_save_history) / (runs - 1)
+                self.time_save_error = CONFIDENCE_Z * math.sqrt(variance / runs) / sample_rate
+        self.sample_rate = sample_rate
 
         if self.debug:
             print("Est. time save (seconds) of keeping " + self.node_name + " in memory: " + str(self.time_save))
@@ -136,73 +346,149 @@ class ExecutionNode(object):
     def get_time_save(self):
         return self.time_save
 
+    """
+        Blend a time measured in a production execution into an exponential moving average.
+
+        Args:
+            key (str): the key of the measurement in the execution statistics.
+            value (float): the measured time in seconds.
+            decay (float): the weight of the new measurement, between 0 and 1.
+    """
+    def update_execution_statistic(self, key: str, value: float, decay: float):
+        if key in self.execution_statistics:
+            self.execution_statistics[key] = (1 - decay) * self.execution_statistics[key] + decay * value
+        else:
+            self.execution_statistics[key] = value
+
+    """
+        The key of the execution statistic of creating this table in a configuration, i.e. whether it is created on
+        disk and which of its inputs are read from memory, as "create:<disk|memory>:<comma-separated inputs>".
+    """
+    @staticmethod
+    def configuration_key(on_disk: bool, inmemory_input_names: set) -> str:
+        return "create:" + ("disk" if on_disk else "memory") + ":" + ",".join(sorted(inmemory_input_names))
+
+    """
+        The mean difference of the observed times of creating this table between configurations differing in a single
+        factor, so that the difference is not confounded by the other factors.
+
+        Args:
+            input_node_name (str): the input read from disk rather than memory, or None for creating this table on
+                disk rather than in memory.
+
+        Returns:
+            the mean difference in seconds over all pairs of observed configurations differing only in that factor,
+            or None if no such pair has been observed.
+    """
+    def observed_difference(self, input_node_name=None):
+        # Statistics stored under other kinds of keys are ignored.
+        configurations = {}
+        for key, elapsed_time in self.execution_statistics.items():
+            parts = key.split(":")
+            if len(parts) == 3 and parts[0] == "create":
+                inmemory_input_names = frozenset(parts[2].split(",")) if parts[2] != "" else frozenset()
+                configurations[(parts[1] == "disk", inmemory_input_names)] = elapsed_time
+
+        differences = []
+        for (on_disk, inmemory_input_names), elapsed_time in configurations.items():
+            if input_node_name is None and on_disk:
+                other_configuration = (False, inmemory_input_names)
+            elif input_node_name is not None and input_node_name not in inmemory_input_names:
+                other_configuration = (on_disk, inmemory_input_names.union([input_node_name]))
+            else:
+                continue
+
+            if other_configuration in configurations:
+                differences.append(elapsed_time - configurations[other_configuration])
+
+        if len(differences) == 0:
+            return None
+        return sum(differences) / len(differences)
+
+    """
+        The time save of keeping this table in memory observed in production executions, i.e. the difference of
+        creating this table on disk and in memory plus, for each downstream table, the difference of creating it
+        while reading this table from disk and from memory, each taken between otherwise identical configurations.
+
+        Returns:
+            the observed time save in seconds, or None if some of the differences have not been observed yet.
+    """
+    def get_observed_time_save(self):
+        differences = [self.observed_difference()]
+        for table in self.downstream_nodes:
+            differences.append(table.observed_difference(self.node_name))
+
+        if any(difference is None for difference in differences):
+            return None
+        return sum(differences)
+
     """
         Create this table/MV on disk by executing the contained SQL statement.
         
         Args:
-            cursor (prestodb.Cursor): a cursor for executing Presto queries.
+            cursor: a cursor of the backend.
             inmemory_prefix (str): the prefix for the schema of the in-memory catalog.
             flagged_node_names (List(str)): flagged nodes.
             on_disk (int): whether to create this table on disk. If false, this table is created in memory.
+            sample_rate (float): the fraction of rows to sample from base tables when profiling, or None to read them
+                in full.
+            sampled_table_names (set): the base tables to sample; all base tables if None.
     """
-    def create_table(self, cursor: Cursor, inmemory_prefix="", flagged_node_names=set(), on_disk=True):
+    def create_table(self, cursor, inmemory_prefix="", flagged_node_names=set(), on_disk=True,
+                     sample_rate=None, sampled_table_names=None):
         if self.debug:
             print("Start executing node " + self.node_name + ":")
             
         # Append the in-memory prefix to input tables in memory.
-        sql_command = self.sql
+        sql_command = self.get_profiling_sql(sample_rate, sampled_table_names)
         for input_name in flagged_node_names.intersection(self.input_node_names):
             sql_command = sql_command.replace(' ' + input_name, ' ' + inmemory_prefix + input_name)
 
         # Append the in-memory prefix to the name of this table if creating in memory.
         if not on_disk:
-            sql_command = sql_command.replace(' ' + self.node_name + ' ', ' ' + inmemory_prefix + self.node_name + ' ').replace(
-                    "with (format = \'PARQUET\')", "")
+            sql_command = self.backend.inmemory_sql(
+                sql_command.replace(' ' + self.node_name + ' ', ' ' + inmemory_prefix + self.node_name + ' '))
 
         # Execute the SQL statement.
-        cursor.execute(sql_command)
-        cursor.fetchall()
+        self.backend.execute(cursor, sql_command)
 
         if self.debug:
-            time_elapsed = int(cursor.stats['elapsedTimeMillis']) / 1000
+            time_elapsed = self.backend.stats(cursor)["elapsed_time"]
             print("Finished executing node " + self.node_name + ". Time elapsed: " + str(time_elapsed))
 
     """
         Materialize the in-memory table to disk.
         
         Args:
-            cursor (prestodb.Cursor): a cursor for executing Presto queries.
+            cursor: a cursor of the backend.
             inmemory_prefix (str): the prefix for the schema of the in-memory catalog.
+            block(bool): whether this operation should be blocking.
     """
-    def materialize_table(self, cursor: Cursor, inmemory_prefix: str):
-        sql_command = "CREATE TABLE " + self.node_name + " WITH (format = 'PARQUET') AS (SELECT * FROM " + \
-            inmemory_prefix + self.node_name + ")"
+    def materialize_table(self, cursor, inmemory_prefix: str, block=False):
+        sql_command = self.backend.materialize_sql(self.node_name, inmemory_prefix + self.node_name)
 
         if self.debug:
             print("Start materializing node " + self.node_name + "...............")
 
         # Execute the SQL statement.
-        cursor.execute(sql_command)
+        self.backend.execute(cursor, sql_command, block)
 
     """
         Drop the created table.
         
         Args:
-            cursor (prestodb.Cursor): a cursor for executing Presto queries.
+            cursor: a cursor of the backend.
             inmemory_prefix (str): the prefix for the schema of the in-memory catalog.
             on_disk (int): whether the table to drop is on disk. If false, the table to drop is in memory.
             block(bool): whether this operation should be blocking.
     """
-    def drop_table(self, cursor: Cursor, inmemory_prefix="", on_disk=True, block=True):
+    def drop_table(self, cursor, inmemory_prefix="", on_disk=True, block=True):
         if on_disk:
-            sql_command = "DROP TABLE IF EXISTS " + self.node_name
+            table_name = self.node_name
         else:
-            sql_command = "DROP TABLE IF EXISTS " + inmemory_prefix + self.node_name
+            table_name = inmemory_prefix + self.node_name
 
         if self.debug:
-            print("Dropping node:" , sql_command)
-
-        cursor.execute(sql_command)
+            print("Dropping node:" , table_name)
 
-        if block:
-            text = cursor.fetchall()
+        self.backend.drop(cursor, table_name, block)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from typing import Callable
+import queue
+import threading
+
+from core.connection.pool import ConnectionPool
+from core.graph.MemoryLedger import MemoryLedger
+from core.graph.Tracer import Tracer, trace_span
+
+
+class GarbageCollector(object):
+
+    """
+        Drops in-memory tables at the earliest safe moment, i.e. as soon as (i) all of its downstream tables have been
+        computed and (ii) it has been materialized to disk. Drops are made on a separate thread and recorded in the
+        memory ledger.
+
+    Args:
+        cursor_pool (ConnectionPool): the pool to acquire the garbage collection cursor from.
+        inmemory_prefix (str): the prefix for the schema of the in-memory catalog.
+        memory_ledger (MemoryLedger): the ledger of bytes resident in the in-memory catalog.
+        on_free (Callable): called with the name of each table after it has been dropped.
+        debug (bool): whether to print debug message during garbage collection.
+        tracer (Tracer): records a span for each drop. Nothing is traced if None.
+    """
+    def __init__(self, cursor_pool: ConnectionPool, inmemory_prefix: str, memory_ledger: MemoryLedger,
+                 on_free: Callable = None, debug=False, tracer: Tracer = None):
+        self.cursor_pool = cursor_pool
+        self.inmemory_prefix = inmemory_prefix
+        self.memory_ledger = memory_ledger
+        self.on_free = on_free
+        self.debug = debug
+        self.tracer = tracer
+
+        self.lock = threading.Lock()
+
+        # Names of the tables satisfying each condition, and of the tables queued for dropping and dropped.
+        self.consumers_done_node_names = set()
+        self.materialized_node_names = set()
+        self.queued_node_names = set()
+        self.dropped_node_names = set()
+
+        # Queue & thread for dropping tables satisfying both conditions.
+        self.gc_queue = None
+        self.gc_thread = None
+
+    """
+        Start the garbage collection thread.
+    """
+    def start(self):
+        self.gc_queue = queue.Queue()
+        self.gc_thread = threading.Thread(target=self.gc_func, args=(self.cursor_pool.acquire(),),
+                                          name="garbage-collector")
+        self.gc_thread.start()
+
+    """
+        Garbage collection thread; drops the tables put on the queue.
+    """
+    def gc_func(self, cursor):
+        try:
+            for node in iter(self.gc_queue.get, None):
+                with trace_span(self.tracer, "drop_table", node.get_node_name()) as args:
+                    node.drop_table(cursor, self.inmemory_prefix, on_disk=False)
+                    freed = self.memory_ledger.remove(node.get_node_name())
+                    args["bytes_freed"] = freed
+
+                with self.lock:
+                    self.dropped_node_names.add(node.get_node_name())
+
+                if self.debug:
+                    print("Garbage collected node " + node.get_node_name() + ", freed " + str(freed) + " bytes")
+
+                if self.on_free is not None:
+                    self.on_free(node.get_node_name())
+        finally:
+            self.cursor_pool.release(cursor)
+
+    """
+        Queue a table for dropping if both conditions hold and it is not queued yet.
+    """
+    def collect_if_safe(self, node):
+        node_name = node.get_node_name()
+        with self.lock:
+            if (node_name in self.consumers_done_node_names and node_name in self.materialized_node_names and
+                    node_name not in self.queued_node_names):
+                self.queued_node_names.add(node_name)
+                self.gc_queue.put(node)
+
+    """
+        Record that all downstream tables of an in-memory table have been computed.
+    """
+    def mark_consumers_done(self, node):
+        with self.lock:
+            self.consumers_done_node_names.add(node.get_node_name())
+        self.collect_if_safe(node)
+
+    """
+        Record that an in-memory table has been materialized to disk.
+    """
+    def mark_materialized(self, node):
+        with self.lock:
+            self.materialized_node_names.add(node.get_node_name())
+        self.collect_if_safe(node)
+
+    """
+        Evict an in-memory table which still has downstream tables to compute; it is dropped once it is materialized.
+        The caller is responsible for having its remaining downstream tables read it from disk.
+    """
+    def evict(self, node):
+        self.mark_consumers_done(node)
+
+    """
+        Number of tables which are no longer needed in memory but have not been dropped yet, i.e. memory that will
+        be freed without computing any further tables.
+    """
+    def num_pending(self) -> int:
+        with self.lock:
+            return len(self.consumers_done_node_names) - len(
+                self.consumers_done_node_names.intersection(self.dropped_node_names))
+
+    """
+        Stop the garbage collection thread after the queued tables are dropped. Does nothing if it was never started.
+    """
+    def join(self):
+        if self.gc_thread is None:
+            return
+        self.gc_queue.put(None)
+        self.gc_thread.join()
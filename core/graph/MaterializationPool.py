@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import time
+
+from core.connection.pool import ConnectionPool
+from core.graph.Tracer import Tracer, trace_span
+
+
+class MaterializationPool(object):
+
+    """
+        A pool of workers materializing in-memory tables to disk concurrently with the rest of the workload. Each
+        write is tracked by a future per node, and its latency is recorded once the write has completed.
+
+    Args:
+        cursor_pool (ConnectionPool): the pool to borrow a cursor from for each write.
+        inmemory_prefix (str): the prefix for the schema of the in-memory catalog.
+        num_workers (int): number of tables materialized concurrently.
+        max_inflight (int): maximum number of writes submitted but not completed; submitting blocks beyond it to
+            apply backpressure to the caller. Unbounded if None.
+        debug (bool): whether to print debug message during materialization.
+        tracer (Tracer): records a span for each write. Nothing is traced if None.
+    """
+    def __init__(self, cursor_pool: ConnectionPool, inmemory_prefix: str, num_workers=1, max_inflight=None,
+                 debug=False, tracer: Tracer = None):
+        self.cursor_pool = cursor_pool
+        self.inmemory_prefix = inmemory_prefix
+        self.num_workers = num_workers
+        self.max_inflight = max_inflight
+        self.debug = debug
+        self.tracer = tracer
+
+        self.executor = None
+
+        # Released when a write completes; bounds the number of writes in flight.
+        self.inflight_semaphore = None
+
+        # A mapping from node name to the future of its materialization.
+        self.futures = {}
+
+        # A mapping from node name to the time in seconds taken to write it to disk.
+        self.write_latency = {}
+
+    """
+        Start the materialization workers.
+    """
+    def start(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="materialization")
+        self.inflight_semaphore = threading.BoundedSemaphore(self.max_inflight) if self.max_inflight else None
+        self.futures = {}
+        self.write_latency = {}
+
+    """
+        Materialize a node on a pooled cursor and block until the write completes.
+
+        Args:
+            node (ExecutionNode): the in-memory node to write to disk.
+    """
+    def materialize(self, node):
+        try:
+            write_start_time = time.time()
+            with self.cursor_pool.cursor() as cursor:
+                with trace_span(self.tracer, "materialize_table", node.get_node_name()):
+                    node.materialize_table(cursor, self.inmemory_prefix, block=True)
+            self.write_latency[node.get_node_name()] = time.time() - write_start_time
+
+            if self.debug:
+                print("Finished materializing node " + node.get_node_name() + ". Write latency: " +
+                      str(self.write_latency[node.get_node_name()]))
+        finally:
+            if self.inflight_semaphore is not None:
+                self.inflight_semaphore.release()
+
+    """
+        Submit a node for materialization, blocking while the maximum number of writes are in flight.
+
+        Args:
+            node (ExecutionNode): the in-memory node to write to disk.
+    """
+    def submit(self, node) -> Future:
+        if self.inflight_semaphore is not None:
+            self.inflight_semaphore.acquire()
+
+        future = self.executor.submit(self.materialize, node)
+        self.futures[node.get_node_name()] = future
+        return future
+
+    """
+        Block until the materialization of a node completes, re-raising its error if it failed.
+
+        Args:
+            node_name (str): the name of a submitted node.
+    """
+    def wait(self, node_name: str):
+        self.futures[node_name].result()
+
+    """
+        Wait for all submitted writes to complete and stop the workers. Raises the first error of a failed write.
+    """
+    def join(self):
+        self.executor.shutdown(wait=True)
+
+        for future in self.futures.values():
+            if future.exception() is not None:
+                raise future.exception()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+import threading
+
+
+class MemoryLedger(object):
+
+    """
+        A live, thread-safe ledger of the bytes held in the in-memory catalog. A table is entered into the ledger when
+        it is admitted into memory and removed when it is dropped.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # A mapping from the name of each resident table to its size in bytes.
+        self.resident_tables = {}
+
+        self.resident_bytes = 0
+        self.peak_bytes = 0
+        self.bytes_freed = 0
+
+    """
+        Enter a table into the ledger.
+
+        Args:
+            node_name (str): the name of the table.
+            size (int): the size of the table in bytes.
+    """
+    def add(self, node_name: str, size: int):
+        with self.lock:
+            self.resident_tables[node_name] = size
+            self.resident_bytes += size
+            self.peak_bytes = max(self.peak_bytes, self.resident_bytes)
+
+    """
+        Update the size of a resident table, e.g. once its actual size is known.
+
+        Args:
+            node_name (str): the name of the table.
+            size (int): the size of the table in bytes.
+    """
+    def resize(self, node_name: str, size: int):
+        with self.lock:
+            if node_name in self.resident_tables:
+                self.resident_bytes += size - self.resident_tables[node_name]
+                self.resident_tables[node_name] = size
+                self.peak_bytes = max(self.peak_bytes, self.resident_bytes)
+
+    """
+        Remove a dropped table from the ledger.
+
+        Args:
+            node_name (str): the name of the table.
+
+        Returns:
+            the number of bytes freed; 0 if the table was not resident.
+    """
+    def remove(self, node_name: str) -> int:
+        with self.lock:
+            size = self.resident_tables.pop(node_name, 0)
+            self.resident_bytes -= size
+            self.bytes_freed += size
+            return size
+
+    def get_size(self, node_name: str) -> int:
+        with self.lock:
+            return self.resident_tables.get(node_name, 0)
+
+    def is_resident(self, node_name: str) -> bool:
+        with self.lock:
+            return node_name in self.resident_tables
+
+    def get_resident_bytes(self) -> int:
+        with self.lock:
+            return self.resident_bytes
+
+    def get_peak_bytes(self) -> int:
+        with self.lock:
+            return self.peak_bytes
+
+    def get_bytes_freed(self) -> int:
+        with self.lock:
+            return self.bytes_freed
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+import json
+import os
+import threading
+
+from sql_metadata import Parser
+
+from core.utils import sql_fingerprint
+
+
+class ParseCache(object):
+
+    """
+        A content-addressed cache of parsed SQL statements. Entries are keyed by the fingerprint of the normalized SQL
+        and hold the tables of the statement, i.e. the output table followed by the input tables. The cache lives in
+        memory and is persisted to a compact JSON file, so reloading a workload does not invoke the parser again.
+
+    Args:
+        path (str): the file to load the cache from and save it to. The cache is kept in memory only if None.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+
+        # A mapping from SQL fingerprint to the tables of the statement.
+        self.entries = {}
+
+        # Whether entries were added since the cache was last loaded or saved.
+        self.dirty = False
+
+        if self.path is not None and os.path.exists(self.path):
+            self.load()
+
+    """
+        Parse the tables of a SQL statement, invoking the parser only on a cache miss.
+
+        Args:
+            sql (str): The DDL for creating the table/MV.
+
+        Returns:
+            tables: the output table followed by the input tables of the statement.
+    """
+    def parse(self, sql: str) -> list:
+        key = sql_fingerprint(sql)
+        with self.lock:
+            if key in self.entries:
+                return list(self.entries[key])
+
+        tables = Parser(sql).tables
+
+        with self.lock:
+            self.entries[key] = list(tables)
+            self.dirty = True
+
+        return list(tables)
+
+    def load(self):
+        with open(self.path, 'r') as f:
+            entries = json.load(f)
+
+        with self.lock:
+            self.entries.update(entries)
+            self.dirty = False
+
+    """
+        Save the cache to its file if entries were added. The file is replaced atomically so that a concurrent reader
+        never sees a partially written cache.
+    """
+    def save(self):
+        if self.path is None:
+            return
+
+        with self.lock:
+            if not self.dirty:
+                return
+
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
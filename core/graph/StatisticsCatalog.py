@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+import json
+import sqlite3
+import threading
+import time
+
+
+class StatisticsCatalog(object):
+
+    """
+        A local SQLite store of node statistics collected by dry runs, so that later refreshes only need to profile
+        nodes without fresh statistics.
+
+        Statistics are keyed by the fingerprint of the node's SQL, the fingerprint of its inputs (covering the SQL of
+        all upstream nodes and the names of the base tables read) and the fingerprint of its downstream nodes, as the
+        time save is measured on them. Changing any of these invalidates the statistics of the node.
+
+    Args:
+        path (str): the SQLite database file.
+        max_age (float): age in seconds after which statistics are no longer fresh. Statistics never expire if None.
+    """
+    def __init__(self, path: str, max_age=None):
+        self.path = path
+        self.max_age = max_age
+
+        # The connection is shared by the threads profiling nodes; access is serialized by the lock.
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS node_statistics ("
+            "sql_fingerprint TEXT NOT NULL, "
+            "input_fingerprint TEXT NOT NULL, "
+            "downstream_fingerprint TEXT NOT NULL, "
+            "node_name TEXT NOT NULL, "
+            "table_size INTEGER NOT NULL, "
+            "time_save REAL NOT NULL, "
+            "time_save_history TEXT NOT NULL, "
+            "profile_concurrency INTEGER, "
+            "sample_rate REAL, "
+            "execution_statistics TEXT, "
+            "created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL, "
+            "PRIMARY KEY (sql_fingerprint, input_fingerprint, downstream_fingerprint))")
+
+        # Catalogs created by earlier versions lack the columns added since.
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(node_statistics)")]
+        for column, column_type in [("profile_concurrency", "INTEGER"), ("sample_rate", "REAL"),
+                                    ("execution_statistics", "TEXT")]:
+            if column not in columns:
+                self.connection.execute("ALTER TABLE node_statistics ADD COLUMN " + column + " " + column_type)
+        self.connection.commit()
+
+    """
+        Look up the statistics of a node. Statistics profiled on samples are only used for lookups at the same sample
+        rate, while statistics profiled on the full data are used for any lookup.
+
+        Args:
+            fingerprints (tuple): the SQL, input and downstream fingerprints of the node.
+            sample_rate (float): the sample rate the statistics are wanted at, or None for the full data.
+
+        Returns:
+            statistics: a dict of the table size, time save, time save history, profiling concurrency, sample rate,
+                execution statistics and timestamps of the node, or None if there are no fresh statistics.
+    """
+    def lookup(self, fingerprints: tuple, sample_rate=None):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT table_size, time_save, time_save_history, profile_concurrency, sample_rate, "
+                "execution_statistics, created_at, updated_at "
+                "FROM node_statistics "
+                "WHERE sql_fingerprint = ? AND input_fingerprint = ? AND downstream_fingerprint = ?",
+                fingerprints).fetchone()
+
+        if row is None or (self.max_age is not None and time.time() - row[7] > self.max_age):
+            return None
+
+        if row[4] is not None and row[4] != sample_rate:
+            return None
+
+        return {"table_size": row[0], "time_save": row[1], "time_save_history": json.loads(row[2]),
+                "profile_concurrency": row[3], "sample_rate": row[4],
+                "execution_statistics": json.loads(row[5]) if row[5] is not None else {}, "created_at": row[6],
+                "updated_at": row[7]}
+
+    """
+        Store the statistics of a node, replacing previous statistics under the same fingerprints.
+
+        Args:
+            fingerprints (tuple): the SQL, input and downstream fingerprints of the node.
+            node (ExecutionNode): the node holding the statistics.
+    """
+    def store(self, fingerprints: tuple, node):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO node_statistics (sql_fingerprint, input_fingerprint, downstream_fingerprint, node_name, "
+                "table_size, time_save, time_save_history, profile_concurrency, sample_rate, execution_statistics, "
+                "created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (sql_fingerprint, input_fingerprint, downstream_fingerprint) DO UPDATE SET "
+                "node_name = excluded.node_name, table_size = excluded.table_size, time_save = excluded.time_save, "
+                "time_save_history = excluded.time_save_history, profile_concurrency = excluded.profile_concurrency, "
+                "sample_rate = excluded.sample_rate, execution_statistics = excluded.execution_statistics, "
+                "updated_at = excluded.updated_at",
+                fingerprints + (node.get_node_name(), node.get_table_size(), node.get_time_save(),
+                                json.dumps(node.time_save_history), node.profile_concurrency, node.sample_rate,
+                                json.dumps(node.execution_statistics), now, now))
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+import numpy as np
+import re
+
+from core.backend.backend import Backend
+
+
+class TimeSaveProfiler(object):
+
+    """
+        Measures the time save of keeping tables in memory with a factorized plan. Instead of re-running every
+        downstream table twice per input, each downstream table is run once per configuration of a small design over
+        which of its profiled inputs are read from memory: all inputs on disk, each input alone in memory, and, for
+        more than two inputs, all inputs in memory. The time saved by each input is then attributed by a least-squares
+        fit of the run times over the inputs read from memory.
+
+        A downstream table with k profiled inputs is thus run k + 1 (or k + 2) times per run instead of 2k times. With
+        a single input, the plan and the time save are the same as those of ExecutionNode.compute_time_save.
+
+    Args:
+        node_dict (dict): a mapping from node name to the execution nodes.
+        execution_order (list): the names of the nodes in the order they are created.
+        inmemory_prefix (str): the prefix for the schema of the in-memory catalog to keep tables in.
+        backend (Backend): the backend executing the measurements.
+        test_suffix (str): the suffix of the test tables created for the measurements.
+        debug (bool): whether to print debug message during profiling.
+    """
+    def __init__(self, node_dict: dict, execution_order: list, inmemory_prefix: str, backend: Backend,
+                 test_suffix='_test', debug=False):
+        self.backend = backend
+        self.node_dict = node_dict
+        self.execution_order = execution_order
+        self.inmemory_prefix = inmemory_prefix
+        self.test_suffix = test_suffix
+        self.debug = debug
+
+    """
+        Plan the configurations to run each downstream table of the profiled nodes in.
+
+        Args:
+            node_names (set): the nodes to measure the time save of.
+
+        Returns:
+            plan: a mapping from the name of each downstream table to its profiled inputs and the list of
+                configurations, each given as the set of profiled inputs read from memory.
+    """
+    def plan(self, node_names: set) -> dict:
+        positions = {node_name: i for i, node_name in enumerate(self.execution_order)}
+
+        plan = {}
+        for consumer_name in self.execution_order:
+            consumer = self.node_dict[consumer_name]
+            parent_names = sorted(consumer.get_input_node_names().intersection(node_names), key=positions.get)
+            if len(parent_names) == 0:
+                continue
+
+            configurations = [set()] + [{parent_name} for parent_name in parent_names]
+            if len(parent_names) > 2:
+                configurations.append(set(parent_names))
+
+            plan[consumer_name] = (parent_names, configurations)
+
+        return plan
+
+    """
+        Attribute the run times of a downstream table over its configurations to its inputs, by fitting
+        time = baseline - sum(time save of each input read from memory) in the least-squares sense.
+
+        Args:
+            parent_names (list): the profiled inputs of the downstream table.
+            configurations (list): the set of inputs read from memory in each run.
+            times (list): the run time (seconds) of each configuration.
+
+        Returns:
+            time_saves: a mapping from the name of each input to the time it saves the downstream table.
+    """
+    @staticmethod
+    def attribute(parent_names: list, configurations: list, times: list) -> dict:
+        design = np.zeros((len(configurations), len(parent_names) + 1))
+        design[:, 0] = 1
+        for i, configuration in enumerate(configurations):
+            for j, parent_name in enumerate(parent_names):
+                if parent_name in configuration:
+                    design[i, j + 1] = 1
+
+        coefficients = np.linalg.lstsq(design, np.array(times, dtype=float), rcond=None)[0]
+        return {parent_name: -float(coefficients[j + 1]) for j, parent_name in enumerate(parent_names)}
+
+    """
+        Create the disk and in-memory test tables of a node.
+
+        Returns:
+            the time (seconds) saved by creating the table in memory instead of on disk.
+    """
+    def create_test_tables(self, cursor, node, sql: str) -> float:
+        node_name = node.get_node_name()
+
+        # Time of creating this table on disk
+        self.backend.execute(cursor, sql.replace(' ' + node_name + ' ', ' ' + node_name + self.test_suffix + ' '))
+        time_save = self.backend.stats(cursor)["elapsed_time"]
+
+        # Time of creating this table in memory
+        self.backend.execute(cursor, self.backend.inmemory_sql(
+            sql.replace(' ' + node_name + ' ', ' ' + self.inmemory_prefix + node_name + self.test_suffix + ' ')))
+        time_save -= self.backend.stats(cursor)["elapsed_time"]
+
+        return time_save
+
+    def drop_test_tables(self, cursor, node_name: str):
+        self.backend.execute(cursor, "DROP TABLE " + node_name + self.test_suffix)
+        self.backend.execute(cursor, "DROP TABLE " + self.inmemory_prefix + node_name + self.test_suffix)
+
+    """
+        Run a downstream table reading the test tables of its profiled inputs, from memory for the inputs in the
+        configuration and from disk otherwise.
+
+        Returns:
+            the run time (seconds) of the downstream table.
+    """
+    def run_consumer(self, cursor, consumer, sql: str, parent_names: list, configuration: set) -> float:
+        consumer_test_node_name = consumer.get_node_name() + self.test_suffix
+
+        sql = sql.replace(' ' + consumer.get_node_name() + ' ', ' ' + consumer_test_node_name + ' ')
+        for parent_name in parent_names:
+            test_node_name = parent_name + self.test_suffix
+            if parent_name in configuration:
+                test_node_name = self.inmemory_prefix + test_node_name
+            sql = re.sub(' ' + re.escape(parent_name) + r'\b', ' ' + test_node_name, sql)
+
+        self.backend.execute(cursor, sql)
+        elapsed = self.backend.stats(cursor)["elapsed_time"]
+
+        # Cleanup downstream table
+        self.backend.execute(cursor, "DROP TABLE " + consumer_test_node_name)
+
+        return elapsed
+
+    """
+        Measure the time save of nodes and set it on each node. Nodes are visited in execution order; the test tables
+        of a node are kept until all of its downstream tables have been run, and each downstream table is run once
+        the test tables of all its profiled inputs exist.
+
+        The tables read by the profiled nodes and their downstream tables must exist on disk.
+
+        Args:
+            cursor: a cursor of the backend.
+            node_names (set): the nodes to measure the time save of.
+            runs (int): compute the time save as the average of a given number of runs to reduce variance.
+            sample_rate (float): the fraction of rows to sample from base tables, or None to measure on the full data.
+            sampled_table_names (set): the base tables to sample; all base tables if None.
+            overhead (float): the fixed overhead in the time saves, which is not extrapolated in sampled mode.
+    """
+    def profile(self, cursor, node_names: set, runs=1, sample_rate=None, sampled_table_names=None, overhead=0):
+        plan = self.plan(node_names)
+
+        # Downstream tables to run once each node has been created, i.e. those whose last profiled input it is.
+        ready_consumer_names = {}
+        for consumer_name, (parent_names, configurations) in plan.items():
+            ready_consumer_names.setdefault(parent_names[-1], []).append(consumer_name)
+
+        sqls = {node_name: self.node_dict[node_name].get_profiling_sql(sample_rate, sampled_table_names)
+                for node_name in self.execution_order if node_name in node_names or node_name in plan}
+
+        if self.debug:
+            num_factorized_runs = sum(len(configurations) for parent_names, configurations in plan.values())
+            num_pairwise_runs = 2 * sum(len(parent_names) for parent_names, configurations in plan.values())
+            print("Running " + str(num_factorized_runs) + " downstream queries per run instead of " +
+                  str(num_pairwise_runs))
+
+        time_save_history = {node_name: [] for node_name in node_names}
+        for i in range(runs):
+            time_saves = {node_name: 0 for node_name in node_names}
+
+            # Number of downstream tables yet to run on the test tables of each node.
+            num_remaining_consumers = {node_name: len(self.node_dict[node_name].downstream_nodes)
+                                       for node_name in node_names}
+
+            for node_name in self.execution_order:
+                if node_name in node_names:
+                    time_saves[node_name] += self.create_test_tables(cursor, self.node_dict[node_name],
+                                                                     sqls[node_name])
+                    if num_remaining_consumers[node_name] == 0:
+                        self.drop_test_tables(cursor, node_name)
+
+                for consumer_name in ready_consumer_names.get(node_name, []):
+                    parent_names, configurations = plan[consumer_name]
+                    times = [self.run_consumer(cursor, self.node_dict[consumer_name], sqls[consumer_name],
+                                               parent_names, configuration) for configuration in configurations]
+
+                    for parent_name, time_save in self.attribute(parent_names, configurations, times).items():
+                        time_saves[parent_name] += time_save
+
+                        # Cleanup test tables once all downstream tables have run on them
+                        num_remaining_consumers[parent_name] -= 1
+                        if num_remaining_consumers[parent_name] == 0:
+                            self.drop_test_tables(cursor, parent_name)
+
+            for node_name in node_names:
+                time_save_history[node_name].append(time_saves[node_name])
+
+        for node_name in node_names:
+            self.node_dict[node_name].set_time_save_history(time_save_history[node_name], sample_rate, overhead)
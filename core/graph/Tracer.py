@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import threading
+import time
+
+
+class Tracer(object):
+
+    """
+        A thread-safe recorder of timed spans, e.g. the creation, materialization and dropping of each table during
+        an execution. Spans are labeled by the thread they ran on and the node they concern, and are exported as
+        Chrome trace events, which can be opened in chrome://tracing or https://ui.perfetto.dev.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # Timestamps of the events are relative to the creation of the tracer.
+        self.start_time = time.time()
+
+        # Complete ('X') events of the recorded spans.
+        self.events = []
+
+        # A mapping from the id of each thread which recorded a span to its name.
+        self.thread_names = {}
+
+    """
+        Record a span around a block of code.
+
+        Args:
+            name (str): the name of the operation, e.g. "create_table".
+            node_name (str): the node the operation concerns.
+            args: further details of the span to show in the trace viewer.
+    """
+    @contextmanager
+    def span(self, name: str, node_name: str, **args):
+        thread = threading.current_thread()
+        start_time = time.time()
+        try:
+            yield args
+        finally:
+            end_time = time.time()
+            event = {"name": name + " " + node_name, "cat": name, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+                     "ts": (start_time - self.start_time) * 1000000, "dur": (end_time - start_time) * 1000000,
+                     "args": dict(args, node=node_name)}
+            with self.lock:
+                self.events.append(event)
+                self.thread_names[thread.ident] = thread.name
+
+    """
+        The recorded spans as a Chrome trace, with a metadata event naming each thread.
+    """
+    def to_chrome_trace(self) -> dict:
+        with self.lock:
+            metadata_events = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                                "args": {"name": thread_name}} for tid, thread_name in self.thread_names.items()]
+            return {"traceEvents": metadata_events + sorted(self.events, key=lambda event: event["ts"]),
+                    "displayTimeUnit": "ms"}
+
+    """
+        Write the recorded spans as a Chrome trace JSON file.
+
+        Args:
+            path (str): the file to write the trace to.
+    """
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+"""
+    Record a span on a tracer, or nothing if the tracer is None.
+"""
+def trace_span(tracer, name: str, node_name: str, **args):
+    if tracer is None:
+        return nullcontext(args)
+    return tracer.span(name, node_name, **args)
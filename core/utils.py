@@ -2,26 +2,48 @@
 # -*- coding: utf-8 -*-
 #
 # Copyright 2021-2022 University of Illinois
+import hashlib
+
 
 """
-Compute the peak memory usage of a configuration of execution plan and set of
-nodes to store in memory.
+Normalize a SQL statement for content addressing; whitespace runs are collapsed, so that reformatting a statement
+does not change its fingerprint.
 """
 
 
-def compute_peak_memory_usage(graph, execution_order, node_sizes,
-                              store_in_memory):
+def normalize_sql(sql):
+    return ' '.join(sql.split())
+
+
+"""
+Compute a content-addressed fingerprint of a SQL statement as the hash of its normalized text.
+"""
+
+
+def sql_fingerprint(sql):
+    return hashlib.sha1(normalize_sql(sql).encode('utf-8')).hexdigest()
+
+
+"""
+Compute the memory profile of a configuration of execution plan and set of
+nodes to store in memory, i.e. the bytes resident in memory at each step of the
+execution order. A node stored in memory is resident from its own step until
+the step of its last downstream node.
+"""
+
+
+def compute_memory_profile(graph, execution_order, node_sizes,
+                           store_in_memory):
     num_successors = [len(list(graph.successors(i))) for i in execution_order]
     num_successors_dict = dict(zip(execution_order, num_successors))
     current_memory_usage = 0
-    max_memory_usage = 0
+    memory_profile = []
 
     for name in execution_order:
         if name in store_in_memory:
             current_memory_usage += node_sizes[name]
 
-        if current_memory_usage > max_memory_usage:
-            max_memory_usage = current_memory_usage
+        memory_profile.append(current_memory_usage)
 
         for parent_name in graph.predecessors(name):
             num_successors_dict[parent_name] -= 1
@@ -29,4 +51,16 @@ def compute_peak_memory_usage(graph, execution_order, node_sizes,
                     parent_name in store_in_memory):
                 current_memory_usage -= node_sizes[parent_name]
 
-    return max_memory_usage
\ No newline at end of file
+    return memory_profile
+
+
+"""
+Compute the peak memory usage of a configuration of execution plan and set of
+nodes to store in memory.
+"""
+
+
+def compute_peak_memory_usage(graph, execution_order, node_sizes,
+                              store_in_memory):
+    return max(compute_memory_profile(graph, execution_order, node_sizes,
+                                      store_in_memory), default=0)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+
+from core.algorithm.optimizer import Optimizer
+from core.algorithm.optimize_nodes.baseline import FlagAllBaseline, FlagNoneBaseline
+from core.algorithm.optimize_nodes.dp import FlagNodesDP
+from core.algorithm.optimize_nodes.greedy import FlagNodesGreedy
+from core.algorithm.optimize_nodes.heuristic import FlagNodesHeuristic
+from core.algorithm.optimize_nodes.lagrangian import FlagNodesLagrangian
+from core.algorithm.optimize_nodes.local_search import FlagNodesLocalSearch
+from core.algorithm.optimize_nodes.mkp import FlagNodesMkp
+from core.algorithm.optimize_nodes.random import FlagNodesRandom
+from core.algorithm.optimize_order.baseline import OptimizeOrderNone
+from core.algorithm.optimize_order.ma_dfs import OptimizeOrderMADFS
+from core.algorithm.optimize_order.post_order import OptimizeOrderPostOrder
+from core.algorithm.optimize_order.sa import OptimizeOrderSA
+from core.algorithm.optimize_order.separator import OptimizeOrderSeparator
+from core.connection.pool import ConnectionPool
+from core.graph.ExecutionGraph import ExecutionGraph
+from core.graph.ParseCache import ParseCache
+from core.graph.StatisticsCatalog import StatisticsCatalog
+import argparse
+import functools
+import json
+import os
+import statistics
+import sys
+import time
+
+NODES_OPTIMIZERS = {"mkp": FlagNodesMkp, "greedy": FlagNodesGreedy, "heuristic": FlagNodesHeuristic,
+                    "lagrangian": FlagNodesLagrangian, "dp": FlagNodesDP,
+                    "local_search": FlagNodesLocalSearch, "random": FlagNodesRandom,
+                    "all": FlagAllBaseline, "none": FlagNoneBaseline}
+
+ORDER_OPTIMIZERS = {"none": OptimizeOrderNone, "ma_dfs": OptimizeOrderMADFS, "sa": OptimizeOrderSA,
+                    "separator": OptimizeOrderSeparator, "post_order": OptimizeOrderPostOrder}
+
+# Metrics compared against the baseline; a configuration regresses if the median of a metric grows beyond the
+# tolerance.
+COMPARED_METRICS = ["wall_time", "optimizer_time"]
+
+WORKLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workloads")
+
+
+"""
+    Create the backend and the connection pool to run the benchmark on.
+"""
+def create_backend(args):
+    if args.backend == "local":
+        from core.backend.local import LocalBackend
+        backend = LocalBackend(args.database)
+    else:
+        import prestodb
+        from core.backend.presto import PrestoBackend
+        backend = PrestoBackend(functools.partial(prestodb.dbapi.connect, host=args.host, port=args.port,
+                                                  user=args.user, catalog=args.catalog, schema=args.schema))
+
+    # One connection each for the worker, the materialization worker and the garbage collector.
+    cursor_pool = ConnectionPool(backend.connect, max_connections=3)
+    return backend, cursor_pool
+
+
+"""
+    Run a workload under every configuration, each a number of times.
+
+    Returns:
+        results: a record of the measurements of each run.
+"""
+def benchmark_workload(args, workload_id, backend, cursor_pool, parse_cache, statistics_catalog):
+    with open(os.path.join(WORKLOAD_DIR, "workload" + str(workload_id) + ".txt"), "r") as f:
+        workload = f.read()
+
+    def load_graph():
+        return ExecutionGraph(cursor_pool, backend.inmemory_prefix, workload, parse_cache=parse_cache,
+                              statistics_catalog=statistics_catalog, backend=backend)
+
+    # Profile the workload once; later graphs reuse the statistics from the catalog.
+    execution_graph = load_graph()
+    execution_graph.cleanup()
+    execution_graph.dry_run(runs=args.dry_runs)
+
+    results = []
+    for memory_limit in args.memory_limits:
+        for nodes_optimizer_name in args.nodes_optimizers:
+            for order_optimizer_name in args.order_optimizers:
+                execution_graph = load_graph()
+                execution_graph.dry_run(runs=args.dry_runs)
+
+                optimizer = Optimizer(int(memory_limit * 1000000), NODES_OPTIMIZERS[nodes_optimizer_name](),
+                                      ORDER_OPTIMIZERS[order_optimizer_name]())
+
+                optimizer_start_time = time.time()
+                execution_graph.optimize(optimizer)
+                optimizer_time = time.time() - optimizer_start_time
+
+                for repeat in range(args.repeats):
+                    execution_graph.cleanup()
+                    wall_time = execution_graph.execute()
+
+                    bytes_materialized = sum(execution_graph.node_dict[node_name].get_inmemory_table_size()
+                                             for node_name in execution_graph.materialization_pool.write_latency)
+
+                    result = {"workload": workload_id,
+                              "memory_limit": memory_limit,
+                              "nodes_optimizer": nodes_optimizer_name,
+                              "order_optimizer": order_optimizer_name,
+                              "repeat": repeat,
+                              "wall_time": wall_time,
+                              "optimizer_time": optimizer_time,
+                              "peak_memory": execution_graph.memory_ledger.get_peak_bytes(),
+                              "bytes_materialized": bytes_materialized,
+                              "num_flagged": len(execution_graph.flagged_node_names),
+                              "num_inmemory": len(execution_graph.inmemory_node_names)}
+                    results.append(result)
+                    print(json.dumps(result))
+
+                execution_graph.cleanup()
+
+    return results
+
+
+"""
+    The key identifying the configuration of a run.
+"""
+def configuration_key(result):
+    return result["workload"], result["memory_limit"], result["nodes_optimizer"], result["order_optimizer"]
+
+
+"""
+    Compare the median of each metric per configuration against a baseline.
+
+    Returns:
+        regressions: a description of each metric of a configuration that grew beyond the tolerance.
+"""
+def compare_to_baseline(results, baseline_results, tolerance):
+    def medians(records):
+        grouped = {}
+        for record in records:
+            grouped.setdefault(configuration_key(record), []).append(record)
+        return {key: {metric: statistics.median(record[metric] for record in group) for metric in COMPARED_METRICS}
+                for key, group in grouped.items()}
+
+    current = medians(results)
+    baseline = medians(baseline_results)
+
+    regressions = []
+    for key in sorted(current.keys() & baseline.keys()):
+        for metric in COMPARED_METRICS:
+            if current[key][metric] > baseline[key][metric] * (1 + tolerance):
+                regressions.append("workload %s, memory limit %s MB, %s + %s: %s %.3f -> %.3f" %
+                                   (key + (metric, baseline[key][metric], current[key][metric])))
+
+    return regressions
+
+
+# Benchmark the refresh of workloads 1-10 over memory limits and optimizer combinations.
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-W", "--workloads", type=int, nargs="+", default=list(range(1, 11)),
+                        help="Workloads to run")
+    parser.add_argument("-M", "--memory-limits", type=float, nargs="+", default=[100, 200, 400],
+                        help="Memory limits in MB")
+    parser.add_argument("--nodes-optimizers", nargs="+", default=list(NODES_OPTIMIZERS),
+                        choices=list(NODES_OPTIMIZERS), help="Nodes optimizers to run")
+    parser.add_argument("--order-optimizers", nargs="+", default=list(ORDER_OPTIMIZERS),
+                        choices=list(ORDER_OPTIMIZERS), help="Order optimizers to run")
+    parser.add_argument("-N", "--repeats", type=int, default=3, help="Number of runs of each configuration")
+    parser.add_argument("--dry-runs", type=int, default=1, help="Number of runs when profiling the workloads")
+    parser.add_argument("--backend", choices=["local", "presto"], default="local",
+                        help="Run on the local engine or on a Presto server")
+    parser.add_argument("--database", default="tpcds.duckdb",
+                        help="Local database file holding the base tables of the workloads")
+    parser.add_argument("--host", default="localhost", help="Presto host")
+    parser.add_argument("--port", type=int, default=8090, help="Presto port")
+    parser.add_argument("--user", default="benchmark", help="Presto user")
+    parser.add_argument("--catalog", default="hive", help="Presto catalog holding the base tables")
+    parser.add_argument("--schema", default="tpcds_10_rc", help="Presto schema holding the base tables")
+    parser.add_argument("--statistics", default="benchmark_statistics.db",
+                        help="Statistics catalog reused across configurations and benchmark runs")
+    parser.add_argument("-O", "--output", default="benchmark_results.json", help="File to write the results to")
+    parser.add_argument("-B", "--baseline", help="Results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative growth of a metric over the baseline flagged as a regression")
+    args = parser.parse_args()
+
+    backend, cursor_pool = create_backend(args)
+    parse_cache = ParseCache("parse_cache.json")
+    statistics_catalog = StatisticsCatalog(args.statistics)
+
+    results = []
+    for workload_id in args.workloads:
+        print("Workload", workload_id, "---------------------------------")
+        results.extend(benchmark_workload(args, workload_id, backend, cursor_pool, parse_cache, statistics_catalog))
+
+    with open(args.output, "w") as f:
+        json.dump({"arguments": vars(args), "results": results}, f, indent=2)
+
+    statistics_catalog.close()
+    cursor_pool.close()
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline_results = json.load(f)["results"]
+
+        regressions = compare_to_baseline(results, baseline_results, args.tolerance)
+        for regression in regressions:
+            print("Regression:", regression)
+
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regressions against", args.baseline)
@@ -3,9 +3,33 @@ from core.algorithm.optimize_nodes.heuristic import FlagNodesHeuristic
 from core.algorithm.optimize_order.ma_dfs import OptimizeOrderMADFS
 from core.graph.ExecutionGraph import ExecutionGraph
 from core.graph.ExecutionNode import ExecutionNode
+from core.graph.ParseCache import ParseCache
 from dag_generator.dag_generator import *
 import argparse
 
+
+"""
+    Manually construct the execution graph of a generated DAG; node i is named str(i) and reads its parents.
+"""
+def build_execution_graph(nx_graph):
+    execution_graph = ExecutionGraph(None, "", "")
+
+    # All nodes share a placeholder statement, which is only parsed once.
+    parse_cache = ParseCache()
+    for node_id in range(len(nx_graph["parents"])):
+        node = ExecutionNode("CREATE TABLE xxx AS (SELECT * FROM yyy);", parse_cache=parse_cache)
+        node.node_name = str(node_id)
+        node.referenced_table_names = {str(parent_id) for parent_id in nx_graph["parents"][node_id]}
+        node.input_node_names = set(node.referenced_table_names)
+        node.table_size = nx_graph["size_out"][node_id]
+        node.time_save = nx_graph["speedup_score"][node_id]
+
+        execution_graph.node_dict[str(node_id)] = node
+        execution_graph.graph.add_node(str(node_id))
+
+    execution_graph.build_graph()
+    return execution_graph
+
 # Run scalability experiments on the generated DAGs.
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -24,17 +48,7 @@ if __name__ == '__main__':
         nx_graph = run_dag_experiments(int(args.size), 1)[0]
 
         # Manually construct the execution graph
-        execution_graph = ExecutionGraph(None, None, None, "", "")
-        for node_id in range(len(nx_graph["parents"])):
-            node = ExecutionNode("CREATE TABLE xxx AS (SELECT * FROM yyy);")
-            node.node_name = str(node_id)
-            node.table_size = nx_graph["size_out"][node_id]
-            node.time_save = nx_graph["speedup_score"][node_id]
-
-            execution_graph.node_dict[str(node_id)] = node
-            execution_graph.graph.add_node(str(node_id))
-
-        execution_graph.build_graph()
+        execution_graph = build_execution_graph(nx_graph)
 
         # Construct the optimizer of choice
         optimizer_nodes = FlagNodesHeuristic()
@@ -106,7 +106,7 @@ def DAGs_generate(mode = 'default', n = 10, max_out = 2,alpha = 1,beta = 1.0):
     dag_list = [] 
     for i in range(len(random_num)):
         dag_list.append([]) 
-        for j in range(math.ceil(random_num[i])):
+        for j in range(math.ceil(random_num[i][0])):
             dag_list[i].append(j)
         generate_num += len(dag_list[i])
 
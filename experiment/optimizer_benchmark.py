@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2021-2022 University of Illinois
+
+from core.algorithm.compact_graph import CompactGraph
+from core.algorithm.optimizer import Optimizer
+from core.algorithm.optimize_nodes.dp import FlagNodesDP
+from core.algorithm.optimize_nodes.greedy import FlagNodesGreedy
+from core.algorithm.optimize_nodes.heuristic import FlagNodesHeuristic
+from core.algorithm.optimize_nodes.lagrangian import FlagNodesLagrangian
+from core.algorithm.optimize_nodes.local_search import FlagNodesLocalSearch
+from core.algorithm.optimize_nodes.mkp import FlagNodesMkp
+from core.algorithm.optimize_nodes.random import FlagNodesRandom
+from core.algorithm.optimize_order.ma_dfs import OptimizeOrderMADFS
+from core.algorithm.optimize_order.post_order import OptimizeOrderPostOrder
+from core.algorithm.optimize_order.sa import OptimizeOrderSA
+from core.algorithm.optimize_order.separator import OptimizeOrderSeparator
+from core.algorithm.peak_memory import PeakMemoryEvaluator
+from dag_experiment import build_execution_graph
+from dag_generator.dag_generator import run_dag_experiments
+import argparse
+import json
+import numpy as np
+import statistics
+import subprocess
+import time
+
+NODES_OPTIMIZERS = {"mkp": FlagNodesMkp, "greedy": FlagNodesGreedy, "heuristic": FlagNodesHeuristic,
+                    "lagrangian": FlagNodesLagrangian, "dp": FlagNodesDP,
+                    "local_search": FlagNodesLocalSearch, "random": FlagNodesRandom}
+
+ORDER_OPTIMIZERS = {"ma_dfs": OptimizeOrderMADFS, "sa": OptimizeOrderSA, "separator": OptimizeOrderSeparator,
+                    "post_order": OptimizeOrderPostOrder}
+
+
+"""
+    The commit of the code being benchmarked, or None outside of a git checkout.
+"""
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+"""
+    Optimize a generated DAG with a nodes & order optimizer pair.
+
+    Returns:
+        result: the optimization runtime and the time save of the optimized graph.
+        plan: the flagged nodes & execution order of the optimized graph.
+"""
+def benchmark_optimizer(nx_graph, memory_limit, nodes_optimizer_name, order_optimizer_name):
+    execution_graph = build_execution_graph(nx_graph)
+    optimizer = Optimizer(memory_limit, NODES_OPTIMIZERS[nodes_optimizer_name](),
+                          ORDER_OPTIMIZERS[order_optimizer_name]())
+
+    start = time.time()
+    execution_graph.optimize(optimizer)
+    runtime = time.time() - start
+
+    flagged_node_names = execution_graph.flagged_node_names if execution_graph.flagged_node_names else set()
+
+    # Sizes & scores of generated graphs are numpy scalars
+    result = {"runtime": runtime,
+              "time_save": float(sum(optimizer.node_scores[node_name] for node_name in flagged_node_names))}
+    return result, (flagged_node_names, execution_graph.execution_order)
+
+
+"""
+    Compute the peak memory usage of the plans found by all optimizer pairs on a generated DAG in one batch.
+
+    Returns:
+        peaks: the peak memory usage of each plan.
+"""
+def evaluate_plans(nx_graph, plans):
+    execution_graph = build_execution_graph(nx_graph)
+    node_sizes = {name: node.get_table_size() for name, node in execution_graph.node_dict.items()}
+    node_scores = {name: node.get_time_save() for name, node in execution_graph.node_dict.items()}
+    compact_graph = CompactGraph(execution_graph.graph, node_sizes, node_scores)
+
+    flags = np.array([compact_graph.to_flags(flagged_node_names) for flagged_node_names, _ in plans])
+    orders = np.array([compact_graph.to_ids(execution_order) for _, execution_order in plans])
+    return PeakMemoryEvaluator(compact_graph).evaluate(flags, orders)
+
+
+"""
+    The mean runtime at each graph size of each optimizer pair.
+"""
+def scaling_curves(results):
+    grouped = {}
+    for result in results:
+        key = result["nodes_optimizer"] + " + " + result["order_optimizer"]
+        grouped.setdefault(key, {}).setdefault(result["size"], []).append(result["runtime"])
+
+    return {key: {size: statistics.mean(runtimes) for size, runtimes in sizes.items()}
+            for key, sizes in grouped.items()}
+
+
+# Benchmark the scalability of the optimizers on generated DAGs, appending the scaling curves to a history file.
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-S", "--sizes", type=int, nargs="+", default=[50, 100, 500, 1000, 5000, 10000],
+                        help="Numbers of nodes in generated graphs")
+    parser.add_argument("-M", "--memory", type=float, default=10, help="Memory container size in GB")
+    parser.add_argument("-G", "--graphs", type=int, default=3, help="Number of graphs generated per size")
+    parser.add_argument("--nodes-optimizers", nargs="+", default=list(NODES_OPTIMIZERS),
+                        choices=list(NODES_OPTIMIZERS), help="Nodes optimizers to run")
+    parser.add_argument("--order-optimizers", nargs="+", default=list(ORDER_OPTIMIZERS),
+                        choices=list(ORDER_OPTIMIZERS), help="Order optimizers to run")
+    parser.add_argument("-H", "--history", default="optimizer_benchmark_history.jsonl",
+                        help="File the results of each benchmark run are appended to")
+    args = parser.parse_args()
+
+    memory_limit = int(args.memory * 1000000000)
+
+    results = []
+    for size in args.sizes:
+        # All optimizers run on the same graphs
+        nx_graphs = run_dag_experiments(size, args.graphs)
+
+        for i, nx_graph in enumerate(nx_graphs):
+            graph_results = []
+            plans = []
+            for nodes_optimizer_name in args.nodes_optimizers:
+                for order_optimizer_name in args.order_optimizers:
+                    result = {"size": size, "graph": i, "num_nodes": len(nx_graph["parents"]),
+                              "nodes_optimizer": nodes_optimizer_name, "order_optimizer": order_optimizer_name}
+                    optimized, plan = benchmark_optimizer(nx_graph, memory_limit, nodes_optimizer_name,
+                                                          order_optimizer_name)
+                    result.update(optimized)
+                    graph_results.append(result)
+                    plans.append(plan)
+
+            # The plans of all optimizer pairs on the graph are checked together
+            for result, peak_memory in zip(graph_results, evaluate_plans(nx_graph, plans)):
+                result["peak_memory"] = float(peak_memory)
+                result["feasible"] = bool(peak_memory <= memory_limit)
+                results.append(result)
+                print(json.dumps(result))
+
+    # Compare the scaling curves against the last recorded run
+    previous_curves = {}
+    try:
+        with open(args.history, "r") as f:
+            lines = f.read().splitlines()
+        if len(lines) > 0:
+            previous_curves = json.loads(lines[-1])["scaling_curves"]
+    except FileNotFoundError:
+        pass
+
+    curves = scaling_curves(results)
+    print("Mean optimization runtime (seconds) by graph size:")
+    for key, curve in curves.items():
+        points = []
+        for size, runtime in sorted(curve.items()):
+            point = str(size) + ": %.4f" % runtime
+            previous_runtime = previous_curves.get(key, {}).get(str(size))
+            if previous_runtime is not None:
+                point += " (was %.4f)" % previous_runtime
+            points.append(point)
+        print("  " + key + " -> " + ", ".join(points))
+
+    with open(args.history, "a") as f:
+        f.write(json.dumps({"timestamp": time.time(), "commit": current_commit(), "arguments": vars(args),
+                            "scaling_curves": curves, "results": results}) + "\n")
@@ -6,7 +6,10 @@
 from core.algorithm.optimizer import Optimizer
 from core.algorithm.optimize_order.ma_dfs import OptimizeOrderMADFS
 from core.algorithm.optimize_nodes.mkp import FlagNodesMkp
+from core.connection.pool import ConnectionPool
 from core.graph.ExecutionGraph import ExecutionGraph
+from core.graph.ParseCache import ParseCache
+import functools
 import prestodb
 
 if __name__ == '__main__':
@@ -14,16 +17,13 @@ if __name__ == '__main__':
     f = open("workloads/workload1.txt", "r")
     workload = f.read()
 
-    # Create 2 Presto connections
-    cursor_main = prestodb.dbapi.connect(host='localhost', port=8090, user='zl20', catalog='hive',
-                                         schema='tpcds_10_rc').cursor()
-    cursor_materialization = prestodb.dbapi.connect(host='localhost', port=8090, user='zl20', catalog='hive',
-                                                    schema='tpcds_10_rc').cursor()
-    cursor_gc = prestodb.dbapi.connect(host='localhost', port=8090, user='zl20', catalog='hive',
-                                       schema='tpcds_10_rc').cursor()
+    # Pool the Presto connections for the main path, the materialization and the garbage collection threads
+    cursor_pool = ConnectionPool(functools.partial(prestodb.dbapi.connect, host='localhost', port=8090, user='zl20',
+                                                   catalog='hive', schema='tpcds_10_rc'), max_connections=3)
 
-    # Create the execution graph
-    execution_graph = ExecutionGraph(cursor_main, cursor_materialization, cursor_gc, 'memory.default.', workload, debug=True)
+    # Create the execution graph, reusing the parsed statements of previous runs
+    execution_graph = ExecutionGraph(cursor_pool, 'memory.default.', workload, debug=True,
+                                     parse_cache=ParseCache('parse_cache.json'))
 
     # Cleanup
     execution_graph.cleanup()
@@ -50,3 +50,4 @@ if __name__ == '__main__':
 
     # Cleanup
     execution_graph.cleanup()
+    cursor_pool.close()